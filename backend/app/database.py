@@ -1,16 +1,25 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./nexus_agent.db"
 
+# Cold tier: resolved/cancelled tickets moved out of the hot table by the archival job
+ARCHIVE_DATABASE_URL = os.getenv("ARCHIVE_DATABASE_URL", "sqlite:///./nexus_archive.db")
+
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+archive_engine = create_engine(
+    ARCHIVE_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+ArchiveSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=archive_engine)
+
 Base = declarative_base()
+ArchiveBase = declarative_base()
 
 def get_db():
     db = SessionLocal()
@@ -18,3 +27,23 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def ensure_indexes(metadata, bind):
+    """create_all() skips tables that already exist, so add indexes declared since then"""
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+def ensure_columns(metadata, bind):
+    """create_all() never alters existing tables, so add nullable columns declared since then"""
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    conn.execute(text(
+                        f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(bind.dialect)}'
+                    ))
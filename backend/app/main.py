@@ -1,14 +1,32 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine, Base
-from .routers import webhooks, tickets, analytics
+from fastapi.middleware.gzip import GZipMiddleware
+from .database import engine, Base, archive_engine, ArchiveBase, SessionLocal, ensure_indexes, ensure_columns
+from .routers import webhooks, tickets, analytics, incidents
 from .services.websocket_manager import manager
+from .services.incident_service import IncidentService
+from .services.archive_service import ArchiveService
+from .services.assignment_service import assignment_engine
+from .services.sla_service import sla_engine
+from .services.write_batcher import write_batcher
+from .services.anomaly_service import anomaly_detector
+import asyncio
+from .responses import FastJSONResponse
 import uvicorn
 
+try:
+    from brotli_asgi import BrotliMiddleware  # optional: br for clients that accept it, gzip otherwise
+except ImportError:
+    BrotliMiddleware = None
+
 # Create database tables
 Base.metadata.create_all(bind=engine)
+ensure_indexes(Base.metadata, engine)
+ArchiveBase.metadata.create_all(bind=archive_engine)
+ensure_columns(ArchiveBase.metadata, archive_engine)
+ensure_indexes(ArchiveBase.metadata, archive_engine)
 
-app = FastAPI(title="NexusAgent API")
+app = FastAPI(title="NexusAgent API", default_response_class=FastJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -19,9 +37,71 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large payloads (ticket lists); small responses are sent as-is
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=1024)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 app.include_router(webhooks.router)
 app.include_router(tickets.router)
 app.include_router(analytics.router)
+app.include_router(incidents.router)
+
+@app.on_event("startup")
+def reconcile_archive():
+    ArchiveService.backfill_columns()
+    # An archive run interrupted between its two commits leaves tickets in both databases
+    db = SessionLocal()
+    try:
+        ArchiveService.reconcile(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def rebuild_incident_clusters():
+    db = SessionLocal()
+    try:
+        IncidentService.rebuild_clusters(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def rebuild_assignment_index():
+    db = SessionLocal()
+    try:
+        assignment_engine.rebuild(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def rebuild_intake_baselines():
+    db = SessionLocal()
+    try:
+        anomaly_detector.rebuild(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+async def start_sla_engine():
+    db = SessionLocal()
+    try:
+        sla_engine.rebuild(db)
+    finally:
+        db.close()
+    app.state.sla_task = asyncio.create_task(sla_engine.run())
+
+@app.on_event("shutdown")
+async def stop_sla_engine():
+    app.state.sla_task.cancel()
+
+@app.on_event("startup")
+async def start_write_batcher():
+    app.state.write_task = asyncio.create_task(write_batcher.run())
+
+@app.on_event("shutdown")
+async def stop_write_batcher():
+    app.state.write_task.cancel()
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -1,7 +1,28 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum, Text
-from .database import Base
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Text, LargeBinary, Float, Boolean
+from sqlalchemy.orm import deferred
+from sqlalchemy.types import TypeDecorator
+from .database import Base, ArchiveBase
 import datetime
 import enum
+import zlib
+
+class CompressedText(TypeDecorator):
+    """Text stored zlib-compressed. Rows written before compression are plain text and read back as-is."""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return zlib.compress(value.encode("utf-8"))
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, str):
+            return value
+        return zlib.decompress(value).decode("utf-8")
+
+# Large text columns are deferred: list queries skip them unless explicitly undeferred
+LARGE_TEXT = "large_text"
 
 class TicketStatus(str, enum.Enum):
     RECEIVED = "Received"
@@ -23,7 +44,7 @@ class Ticket(Base):
     ticket_id = Column(String, unique=True, index=True)
     source = Column(String)  # WhatsApp or Email
     sender = Column(String)  # Phone number or Email address
-    original_message = Column(Text)
+    original_message = deferred(Column(Text), group=LARGE_TEXT)
     
     summary = Column(String)
     category = Column(String)
@@ -35,7 +56,7 @@ class Ticket(Base):
     
     # Incident Swarm Detection
     is_duplicate = Column(String, default="false")
-    parent_incident_id = Column(String, nullable=True)
+    parent_incident_id = Column(String, nullable=True, index=True)
     ticket_role = Column(String, default="Primary") # Primary | Follower
     similarity_score = Column(Integer, default=0)
     swarm_reason = Column(Text, nullable=True)
@@ -52,7 +73,7 @@ class Ticket(Base):
     sentiment = Column(String)
     
     # Human Handoff Summary
-    handoff_summary = Column(Text, nullable=True)
+    handoff_summary = deferred(Column(Text, nullable=True), group=LARGE_TEXT)
     ai_attempts = Column(Text, nullable=True)
     next_best_action = Column(Text, nullable=True)
     
@@ -67,5 +88,85 @@ class Ticket(Base):
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     
     # AI Processing logs/guardrail info
-    ai_raw_output = Column(Text, nullable=True)
-    validation_errors = Column(Text, nullable=True)
+    ai_raw_output = deferred(Column(CompressedText, nullable=True), group=LARGE_TEXT)
+    validation_errors = deferred(Column(Text, nullable=True), group=LARGE_TEXT)
+
+class IncidentCluster(Base):
+    """A Primary incident and its swarm-detected followers, maintained on every follower insert."""
+    __tablename__ = "incident_clusters"
+
+    id = Column(Integer, primary_key=True, index=True)
+    parent_incident_id = Column(String, unique=True, index=True)
+    follower_count = Column(Integer, default=0)
+    first_seen = Column(DateTime, default=datetime.datetime.utcnow)
+    last_seen = Column(DateTime, default=datetime.datetime.utcnow)
+    status = Column(String, default="Open")  # Open | Resolved
+    last_update = Column(Text, nullable=True)  # Last message broadcast to the cluster
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+class TicketAttachment(Base):
+    """Attachment metadata; the file itself is spooled to disk and referenced by storage_path."""
+    __tablename__ = "ticket_attachments"
+
+    id = Column(Integer, primary_key=True, index=True)
+    ticket_id = Column(String, index=True)
+    filename = Column(String, nullable=True)
+    content_type = Column(String)
+    size_bytes = Column(Integer)
+    sha256 = Column(String)
+    storage_path = Column(String, nullable=True)  # None when the part exceeded the size cap
+    is_inline = Column(String, default="false")
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    @property
+    def stored(self):
+        return self.storage_path is not None
+
+class ShadowResult(Base):
+    """One triage run of a ticket's message by a shadow candidate (or the primary, as the baseline)."""
+    __tablename__ = "shadow_results"
+
+    id = Column(Integer, primary_key=True, index=True)
+    ticket_id = Column(String, index=True)
+    mode = Column(String, default="live")  # live | replay
+    run_id = Column(String, index=True, nullable=True)  # groups one replay batch
+    candidate = Column(String, index=True)
+    model = Column(String)
+    prompt_variant = Column(String)
+    latency_ms = Column(Float)
+    prompt_tokens = Column(Integer, default=0)
+    output_tokens = Column(Integer, default=0)
+    cost_usd = Column(Float, nullable=True)  # None when the model has no configured price
+    error = Column(Text, nullable=True)
+    output = deferred(Column(CompressedText, nullable=True), group=LARGE_TEXT)
+    # Agreement with the primary decision; None when the candidate produced no usable result
+    priority_match = Column(Boolean, nullable=True)
+    department_match = Column(Boolean, nullable=True)
+    spam_match = Column(Boolean, nullable=True)
+    duplicate_match = Column(Boolean, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+# Cold tier (lives in the archive DB, see database.ArchiveBase)
+
+class ArchivedTicket(ArchiveBase):
+    __tablename__ = "archived_tickets"
+
+    ticket_id = Column(String, primary_key=True)
+    partition = Column(String, index=True)  # YYYY-MM of resolution/closure
+    source = Column(String)
+    sender = Column(String, index=True)
+    status = Column(String)
+    priority = Column(String)
+    department = Column(String)
+    is_spam = Column(String, default="false")
+    assigned_to = Column(String, index=True, nullable=True)
+    ticket_role = Column(String, nullable=True)
+    parent_incident_id = Column(String, index=True, nullable=True)
+    summary = Column(String)
+    created_at = Column(DateTime)
+    assigned_at = Column(DateTime, nullable=True)
+    resolved_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    # Full ticket row as compressed JSON (includes original_message / ai_raw_output)
+    payload = Column(CompressedText)
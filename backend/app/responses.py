@@ -0,0 +1,43 @@
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from typing import List
+from . import schemas
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+# Built once at import: validating/serializing through a precompiled adapter avoids
+# per-row model construction and FastAPI's generic jsonable_encoder walk.
+TICKET_LIST_ADAPTER = TypeAdapter(List[schemas.TicketResponse])
+TICKET_COMPACT_ADAPTER = TypeAdapter(List[schemas.TicketListItem])
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(jsonable_encoder(content)).encode("utf-8")
+
+
+def dump_ticket_rows(rows, columns=None, compact: bool = False) -> bytes:
+    """
+    Serialize ticket rows (column mappings or ORM objects) to JSON bytes.
+
+    Full and compact views go through the precompiled TypeAdapters so the response
+    contract is unchanged; bare projections are plain dicts and skip validation.
+    """
+    if compact:
+        return TICKET_COMPACT_ADAPTER.dump_json(TICKET_COMPACT_ADAPTER.validate_python(rows, from_attributes=True))
+    if columns is None:
+        return TICKET_LIST_ADAPTER.dump_json(TICKET_LIST_ADAPTER.validate_python(rows, from_attributes=True))
+    return dumps([{c: row[c] for c in columns} for row in rows])
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -1,9 +1,17 @@
-from fastapi import APIRouter, Depends
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response
+from sqlalchemy.orm import Session, undefer
 from ..database import get_db
 from .. import models
+from ..services.archive_service import ArchiveService
+from ..services.cache_service import response_cache, TAG_TICKETS
+from ..services.write_batcher import write_batcher
+from ..services.ai_output_parser import ai_output_parser
+from ..services.shadow_service import shadow_service
+from ..services.anomaly_service import anomaly_detector
+from itertools import chain
 import pandas as pd
+import io
 import os
 from datetime import datetime
 
@@ -11,7 +19,17 @@ router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 @router.get("/export")
 def export_tickets(db: Session = Depends(get_db)):
-    tickets = db.query(models.Ticket).all()
+    # The workbook is cached until the next ticket mutation, so repeated exports reuse it
+    content = response_cache.get_or_compute("analytics/export", {}, [TAG_TICKETS], lambda: _build_export(db))
+    filename = f"tickets_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    return Response(
+        content,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def _build_export(db: Session) -> bytes:
+    tickets = chain(db.query(models.Ticket).options(undefer(models.Ticket.original_message)).yield_per(500), ArchiveService.iter_tickets())
     
     data = []
     for t in tickets:
@@ -29,13 +47,63 @@ def export_tickets(db: Session = Depends(get_db)):
         })
     
     df = pd.DataFrame(data)
-    filename = f"tickets_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    filepath = f"/tmp/{filename}"
-    
-    df.to_excel(filepath, index=False)
-    
-    return FileResponse(
-        filepath, 
-        filename=filename, 
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+@router.get("/cache")
+def cache_stats():
+    """Hit ratio and stampede-coalescing counters of the response cache"""
+    return response_cache.get_stats()
+
+@router.get("/write-path")
+def write_path_stats():
+    """Group-commit batch sizes, commit latency and caller wait-time histograms"""
+    return write_batcher.get_stats()
+
+@router.get("/ai-repairs")
+def ai_repair_stats():
+    """How AI triage output was handled (clean / repaired locally / re-asked / failed) and repairs per field"""
+    return ai_output_parser.get_stats()
+
+@router.get("/shadow")
+def shadow_report(
+    mode: str = Query(None, pattern="^(live|replay)$"),
+    run_id: str = None,
+    days: int = Query(None, ge=0),
+    db: Session = Depends(get_db)
+):
+    """Shadow-mode comparison of candidate triage configs against the primary one"""
+    return {**shadow_service.get_config(), **shadow_service.report(db, mode, run_id, days)}
+
+@router.post("/shadow/replay")
+async def start_shadow_replay(
+    candidates: str = Query(None, description="Comma-separated candidate names (default: all)"),
+    limit: int = Query(100, ge=1, le=5000),
+    days: int = Query(None, ge=0),
+    concurrency: int = Query(4, ge=1, le=32)
+):
+    """Re-triage historical tickets through the candidates in the background; poll /shadow?run_id=..."""
+    names = [c.strip() for c in candidates.split(",") if c.strip()] if candidates else None
+    try:
+        run_id = shadow_service.start_replay(names, limit, days, concurrency)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "started", "run_id": run_id}
+
+@router.get("/intake-rates")
+def intake_rates(
+    kind: str = Query(None, pattern="^(total|department|source)$"),
+    buckets: int = Query(None, ge=1)
+):
+    """Live per-bucket intake counts with the baselines the anomaly detector compares them against"""
+    return anomaly_detector.series(kind, buckets)
+
+@router.post("/archive")
+def archive_tickets(
+    older_than_days: int = Query(int(os.getenv("ARCHIVE_AFTER_DAYS", "30")), ge=0),
+    batch_size: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    """Move resolved/cancelled tickets older than the cutoff into the archive DB"""
+    return ArchiveService.archive_closed_tickets(db, older_than_days, batch_size)
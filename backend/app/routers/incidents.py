@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends, Query, HTTPException, Body
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from ..database import get_db
+from .. import schemas
+from ..services.incident_service import IncidentService
+
+router = APIRouter(prefix="/incidents", tags=["incidents"])
+
+def _get_cluster_or_404(db: Session, parent_incident_id: str):
+    cluster = IncidentService.get_cluster(db, parent_incident_id)
+    if not cluster:
+        raise HTTPException(status_code=404, detail="Incident cluster not found")
+    return cluster
+
+@router.get("/", response_model=List[schemas.IncidentClusterResponse])
+def list_clusters(
+    status: Optional[str] = Query(None, description="Open | Resolved"),
+    limit: int = 50,
+    db: Session = Depends(get_db)
+):
+    return IncidentService.list_clusters(db, status, limit)
+
+@router.get("/{parent_incident_id}", response_model=schemas.IncidentClusterDetail)
+def get_cluster(parent_incident_id: str, db: Session = Depends(get_db)):
+    """Cluster summary with the Primary ticket and all followers"""
+    cluster = _get_cluster_or_404(db, parent_incident_id)
+    members = IncidentService.get_members(db, parent_incident_id)
+    detail = schemas.IncidentClusterDetail.model_validate(cluster)
+    detail.parent = next((schemas.TicketListItem.model_validate(t) for t in members if t.ticket_id == parent_incident_id), None)
+    detail.followers = [schemas.TicketListItem.model_validate(t) for t in members if t.ticket_id != parent_incident_id]
+    return detail
+
+@router.post("/{parent_incident_id}/resolve")
+async def resolve_cluster(parent_incident_id: str, db: Session = Depends(get_db)):
+    """Resolve the Primary ticket and every open follower in one statement"""
+    cluster = _get_cluster_or_404(db, parent_incident_id)
+    return await IncidentService.resolve_cluster(db, cluster)
+
+@router.post("/{parent_incident_id}/reassign")
+async def reassign_cluster(parent_incident_id: str, payload: dict = Body(...), db: Session = Depends(get_db)):
+    """Assign the whole cluster to an admin and/or move it to another department"""
+    admin_name = payload.get("admin_name")
+    department = payload.get("department")
+    if not admin_name and not department:
+        raise HTTPException(status_code=400, detail="admin_name or department is required")
+    cluster = _get_cluster_or_404(db, parent_incident_id)
+    return await IncidentService.reassign_cluster(db, cluster, admin_name, department)
+
+@router.post("/{parent_incident_id}/broadcast")
+async def broadcast_update(parent_incident_id: str, payload: dict = Body(...), db: Session = Depends(get_db)):
+    """
+    Send one status update to every sender in the cluster. Each channel's recipients are
+    posted to its n8n webhook (INCIDENT_BROADCAST_WEBHOOKS); `delivery` reports the
+    outcome per channel.
+    """
+    message = payload.get("message")
+    if not message:
+        raise HTTPException(status_code=400, detail="Message is required")
+    cluster = _get_cluster_or_404(db, parent_incident_id)
+    return await IncidentService.broadcast_update(db, cluster, message)
@@ -1,115 +1,227 @@
 from fastapi import APIRouter, Depends, Query, HTTPException, Body
 from sqlalchemy.orm import Session
-from typing import List
+from pydantic import ValidationError
+from fastapi.responses import Response
+from typing import List, Optional
 from ..database import get_db
 from .. import schemas, models
 from ..services.ticket_service import TicketService
+from ..services.archive_service import ArchiveService
+from ..services.assignment_service import assignment_engine
+from ..services.anomaly_service import anomaly_detector
+from ..services.sla_service import sla_engine, sla_window
+from ..services.cache_service import response_cache, ticket_tag, TAG_TICKETS, TAG_STATS
+from ..responses import dumps, dump_ticket_rows
 
 router = APIRouter(prefix="/tickets", tags=["tickets"])
 
+COMPACT_FIELDS = list(schemas.TicketListItem.model_fields)
+
+FIELDS_DESCRIPTION = "Comma-separated TicketResponse fields to return, or 'compact' for the list schema. Omit for full tickets."
+
+def _parse_fields(fields: Optional[str]):
+    """Resolve the `fields` query param into a column list (None = full TicketResponse)"""
+    if not fields:
+        return None
+    if fields == "compact":
+        return COMPACT_FIELDS
+    columns = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [c for c in columns if c not in schemas.TicketResponse.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    if "ticket_id" not in columns:
+        columns.insert(0, "ticket_id")
+    return columns
+
+def _serialize(rows, columns) -> bytes:
+    """Encode rows as TicketResponse, TicketListItem or a bare projection (omitted keys stay omitted)"""
+    return dump_ticket_rows(rows, columns, compact=columns is COMPACT_FIELDS)
+
+def _cached(route: str, params: dict, tags: list, compute):
+    """Serve a read endpoint through the response cache; compute() must return JSON bytes"""
+    body = response_cache.get_or_compute(route, params, tags, compute)
+    return Response(content=body, media_type="application/json")
+
 @router.get("/", response_model=List[schemas.TicketResponse])
 def get_tickets(
     skip: int = 0,
     limit: int = 100,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
     db: Session = Depends(get_db)
 ):
-    return TicketService.get_tickets(db, skip, limit)
+    columns = _parse_fields(fields)
+    return _cached(
+        "tickets", {"skip": skip, "limit": limit, "fields": fields}, [TAG_TICKETS],
+        lambda: _serialize(TicketService.get_tickets(db, skip, limit, columns), columns)
+    )
 
 @router.get("/stats")
 def get_stats(db: Session = Depends(get_db)):
-    return TicketService.get_ticket_stats(db)
+    # Keyed by the current intake bucket so the volume_over_time chart moves every bucket, not every cache TTL
+    return _cached(
+        "tickets/stats", {"bucket": anomaly_detector.current_bucket()}, [TAG_STATS],
+        lambda: dumps(TicketService.get_ticket_stats(db))
+    )
+
+@router.get("/search", response_model=List[schemas.TicketResponse])
+def search_tickets(
+    q: str = Query(..., min_length=2),
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """Search by ticket id, sender or summary across live and archived tickets"""
+    return _cached(
+        "tickets/search", {"q": q, "limit": limit}, [TAG_TICKETS],
+        lambda: _serialize(TicketService.search_tickets(db, q, limit), None)
+    )
 
 @router.get("/{ticket_id}", response_model=schemas.TicketResponse)
 def get_ticket(ticket_id: str, db: Session = Depends(get_db)):
-    ticket = db.query(models.Ticket).filter(models.Ticket.ticket_id == ticket_id).first()
-    if not ticket:
+    def compute():
+        ticket = TicketService.get_ticket(db, ticket_id)
+        if not ticket:
+            raise HTTPException(status_code=404, detail="Ticket not found")
+        return schemas.TicketResponse.model_validate(ticket).model_dump_json().encode("utf-8")
+    return _cached("ticket", {"ticket_id": ticket_id}, [ticket_tag(ticket_id)], compute)
+
+@router.get("/{ticket_id}/attachments", response_model=List[schemas.AttachmentResponse])
+def get_attachments(ticket_id: str, db: Session = Depends(get_db)):
+    """Attachment metadata for a ticket (files are stored by reference, not inline)"""
+    return TicketService.get_attachments(db, ticket_id)
+
+async def _apply_single(db: Session, ticket_id: str, op: str, value: str):
+    result = await TicketService.apply_operations(db, [{"ticket_id": ticket_id, "op": op, "value": value}])
+    if not result["results"][0]["ok"]:
         raise HTTPException(status_code=404, detail="Ticket not found")
-    return ticket
+    return TicketService.get_ticket(db, ticket_id)
+
+@router.post("/batch")
+async def batch_update(payload: dict = Body(...), db: Session = Depends(get_db)):
+    """
+    Apply many status/department/assign changes in one transaction.
+    Payload: { "operations": [{ "ticket_id": "...", "op": "status|department|assign", "value": "..." }] }
+    """
+    operations = payload.get("operations")
+    if not isinstance(operations, list) or not operations:
+        raise HTTPException(status_code=400, detail="Operations list is required")
+    if len(operations) > 1000:
+        raise HTTPException(status_code=400, detail="At most 1000 operations per batch")
+
+    # Malformed items are reported individually and never reach the (possibly shared) transaction
+    results = [None] * len(operations)
+    valid, positions = [], []
+    for index, item in enumerate(operations):
+        try:
+            valid.append(schemas.TicketOperation.model_validate(item).model_dump())
+            positions.append(index)
+        except ValidationError as e:
+            fields = item if isinstance(item, dict) else {}
+            results[index] = {
+                "ticket_id": fields.get("ticket_id") if isinstance(fields.get("ticket_id"), str) else None,
+                "op": fields.get("op") if isinstance(fields.get("op"), str) else None,
+                "ok": False,
+                "error": "; ".join(f"{'.'.join(map(str, err['loc'])) or 'item'}: {err['msg']}" for err in e.errors())
+            }
 
-@router.patch("/{ticket_id}/status")
+    if valid:
+        outcome = await TicketService.apply_operations(db, valid)
+        for index, result in zip(positions, outcome["results"]):
+            results[index] = result
+    applied = sum(1 for r in results if r["ok"])
+    return {"applied": applied, "failed": len(results) - applied, "results": results}
+
+@router.patch("/{ticket_id}/status", response_model=schemas.TicketResponse)
 async def update_status(ticket_id: str, payload: dict = Body(...), db: Session = Depends(get_db)):
     status = payload.get("status")
     if not status:
         raise HTTPException(status_code=400, detail="Status is required")
-    ticket = db.query(models.Ticket).filter(models.Ticket.ticket_id == ticket_id).first()
-    if not ticket:
-        raise HTTPException(status_code=404, detail="Ticket not found")
-    
-    ticket.status = status
-    
-    # Auto-set resolved_at when ticket is resolved
-    if status == "Resolved":
-        from datetime import datetime
-        ticket.resolved_at = datetime.utcnow()
-    
-    db.commit()
-    return ticket
+    # resolved_at is set automatically when status becomes Resolved
+    return await _apply_single(db, ticket_id, "status", status)
 
-@router.patch("/{ticket_id}/department")
+@router.patch("/{ticket_id}/department", response_model=schemas.TicketResponse)
 async def update_department(ticket_id: str, payload: dict = Body(...), db: Session = Depends(get_db)):
     department = payload.get("department")
     if not department:
         raise HTTPException(status_code=400, detail="Department is required")
-    
-    ticket = db.query(models.Ticket).filter(models.Ticket.ticket_id == ticket_id).first()
-    if not ticket:
-        raise HTTPException(status_code=404, detail="Ticket not found")
-    
-    ticket.department = department
-    ticket.reassigned_by = "Human"
-    ticket.is_flagged = "false" # Clear flag if reassigned manually
-    db.commit()
-    return ticket
+    return await _apply_single(db, ticket_id, "department", department)
 
 # Admin Workspace Endpoints
 
-@router.patch("/{ticket_id}/assign")
+@router.patch("/{ticket_id}/assign", response_model=schemas.TicketResponse)
 async def assign_ticket(ticket_id: str, payload: dict = Body(...), db: Session = Depends(get_db)):
     """Assign a ticket to an admin"""
     admin_name = payload.get("admin_name")
     if not admin_name:
         raise HTTPException(status_code=400, detail="Admin name is required")
-    
-    ticket = db.query(models.Ticket).filter(models.Ticket.ticket_id == ticket_id).first()
-    if not ticket:
-        raise HTTPException(status_code=404, detail="Ticket not found")
-    
-    from datetime import datetime
-    ticket.assigned_to = admin_name
-    ticket.assigned_at = datetime.utcnow()
-    ticket.status = "Processing"
-    db.commit()
-    return ticket
+    return await _apply_single(db, ticket_id, "assign", admin_name)
 
 @router.get("/workspace/currently-solving", response_model=List[schemas.TicketResponse])
-def get_currently_solving(admin_name: str = Query(...), db: Session = Depends(get_db)):
+def get_currently_solving(
+    admin_name: str = Query(...),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_db)
+):
     """Get tickets currently being worked on by an admin"""
-    tickets = db.query(models.Ticket).filter(
-        models.Ticket.assigned_to == admin_name,
-        models.Ticket.status.in_(["Processing", "Under Review", "Waiting"])
-    ).order_by(models.Ticket.assigned_at.desc()).all()
-    return tickets
+    columns = _parse_fields(fields)
+    def compute():
+        stmt = TicketService.select_tickets(columns).where(
+            models.Ticket.assigned_to == admin_name,
+            models.Ticket.status.in_(["Processing", "Under Review", "Waiting"])
+        ).order_by(models.Ticket.assigned_at.desc())
+        return _serialize(db.execute(stmt).mappings().all(), columns)
+    return _cached("workspace/currently-solving", {"admin_name": admin_name, "fields": fields}, [TAG_TICKETS], compute)
 
 @router.get("/workspace/solved-history", response_model=List[schemas.TicketResponse])
-def get_solved_history(admin_name: str = Query(...), db: Session = Depends(get_db)):
+def get_solved_history(
+    admin_name: str = Query(...),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_db)
+):
     """Get resolved tickets by an admin"""
-    tickets = db.query(models.Ticket).filter(
-        models.Ticket.assigned_to == admin_name,
-        models.Ticket.status == "Resolved"
-    ).order_by(models.Ticket.resolved_at.desc()).all()
-    return tickets
+    columns = _parse_fields(fields)
+    def compute():
+        stmt = TicketService.select_tickets(columns).where(
+            models.Ticket.assigned_to == admin_name,
+            models.Ticket.status == "Resolved"
+        ).order_by(models.Ticket.resolved_at.desc())
+        rows = list(db.execute(stmt).mappings().all())
+        # Archived tickets stay in the admin's history. They were resolved before the
+        # archive cutoff, so they follow the hot rows in resolved_at order.
+        archived = ArchiveService.get_resolved_by(admin_name)
+        rows += [{c: t.get(c) for c in columns} for t in archived] if columns else archived
+        return _serialize(rows, columns)
+    return _cached("workspace/solved-history", {"admin_name": admin_name, "fields": fields}, [TAG_TICKETS], compute)
+
+@router.get("/workspace/load-board")
+def get_load_board():
+    """Live open-work load per admin, served from the in-memory assignment index"""
+    return assignment_engine.load_board()
+
+@router.get("/workspace/sla")
+def get_sla_status():
+    """Open tickets tracked by the SLA engine, upcoming deadlines and current breaches"""
+    return sla_engine.status()
 
 @router.get("/workspace/performance")
 def get_performance(admin_name: str = Query(...), db: Session = Depends(get_db)):
     """Get performance metrics for an admin"""
+    return _cached(
+        "workspace/performance", {"admin_name": admin_name}, [TAG_TICKETS],
+        lambda: dumps(_compute_performance(db, admin_name))
+    )
+
+def _compute_performance(db: Session, admin_name: str):
     from sqlalchemy import func
     from datetime import datetime
     
+    # Resolved tickets archived out of the hot table still count towards the admin's record
+    archived = ArchiveService.get_resolution_rows(admin_name)
+    
     # Total tickets solved
     total_solved = db.query(func.count(models.Ticket.id)).filter(
         models.Ticket.assigned_to == admin_name,
         models.Ticket.status == "Resolved"
-    ).scalar()
+    ).scalar() + len(archived)
     
     # Currently solving
     currently_solving = db.query(func.count(models.Ticket.id)).filter(
@@ -117,15 +229,23 @@ def get_performance(admin_name: str = Query(...), db: Session = Depends(get_db))
         models.Ticket.status.in_(["Processing", "Under Review", "Waiting"])
     ).scalar()
     
-    # Get resolved tickets for avg calculation
-    resolved_tickets = db.query(models.Ticket).filter(
+    # Get resolved tickets for avg and SLA calculation
+    resolved_tickets = db.query(
+        models.Ticket.priority,
+        models.Ticket.source,
+        models.Ticket.created_at,
+        models.Ticket.assigned_at,
+        models.Ticket.resolved_at
+    ).filter(
         models.Ticket.assigned_to == admin_name,
         models.Ticket.status == "Resolved",
-        models.Ticket.assigned_at.isnot(None),
         models.Ticket.resolved_at.isnot(None)
     ).all()
+    resolved_tickets += [t for t in archived if t.resolved_at]
+    sla_tickets = [t for t in resolved_tickets if t.created_at]
+    resolved_tickets = [t for t in resolved_tickets if t.assigned_at]
     
-    # Calculate average resolution time
+    # Calculate average resolution time (from assignment)
     if resolved_tickets:
         total_seconds = sum([
             (t.resolved_at - t.assigned_at).total_seconds() 
@@ -141,15 +261,14 @@ def get_performance(admin_name: str = Query(...), db: Session = Depends(get_db))
         models.Ticket.assigned_to == admin_name,
         models.Ticket.status == "Resolved",
         models.Ticket.priority.in_(["High", "Critical"])
-    ).scalar()
+    ).scalar() + sum(1 for t in archived if t.priority in ("High", "Critical"))
     
-    # SLA success rate (assuming 24 hours SLA)
-    sla_limit_seconds = 24 * 3600
+    # SLA success rate: the clock starts at intake, as in the SLA engine
     sla_met = sum([
-        1 for t in resolved_tickets 
-        if (t.resolved_at - t.assigned_at).total_seconds() <= sla_limit_seconds
+        1 for t in sla_tickets 
+        if (t.resolved_at - t.created_at) <= sla_window(t.priority, t.source)
     ])
-    sla_success_rate = round((sla_met / len(resolved_tickets) * 100), 1) if resolved_tickets else 0
+    sla_success_rate = round((sla_met / len(sla_tickets) * 100), 1) if sla_tickets else 0
     
     return {
         "admin_name": admin_name,
@@ -1,13 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Request
 from sqlalchemy.orm import Session
 from ..database import get_db
 from .. import schemas, models
 from ..services.ai_service import ai_service
 from ..services.ticket_service import TicketService
+from ..services.email_service import RawEmailParser, MultipartEmailReader, EmailTooLarge, MULTIPART_OVERHEAD_BYTES
+from ..services.shadow_service import shadow_service
+from ..services.anomaly_service import anomaly_detector
 import logging
 
 router = APIRouter(prefix="/webhooks", tags=["webhooks"])
 
+async def _triage_and_create(db: Session, ticket_data: schemas.TicketCreate, triage_text: str):
+    """Run AI triage against the active incidents and persist the ticket"""
+    active_incidents = TicketService.get_active_incidents(db)
+    active_incidents_data = [{"ticket_id": t.ticket_id, "summary": t.summary, "status": t.status} for t in active_incidents]
+    run = await ai_service.analyze(triage_text, active_incidents_data)
+    ai_result, raw_output, errors = run["result"], run["raw_output"], run["errors"]
+    
+    if not ai_result:
+        ai_result = {
+            "summary": "Manual Review Required - AI Failed",
+            "category": "Uncategorized",
+            "priority": "High",
+            "sentiment": "Neutral"
+        }
+    
+    ticket = await TicketService.create_ticket(db, ticket_data, ai_result, raw_output, errors)
+    # Candidate triage configs see a sample of live traffic in the background
+    shadow_service.mirror(ticket, triage_text, active_incidents_data, run)
+    
+    # Intake-rate spikes per department/source/keyword surface outages before swarm matching does
+    if ticket.is_spam != "true":
+        anomaly = anomaly_detector.observe(ticket.department, ticket.source, triage_text)
+        if anomaly:
+            try:
+                await TicketService.open_anomaly_incident(db, anomaly)
+            except Exception as e:
+                logging.error(f"Failed to open anomaly incident: {str(e)}")
+    return ticket, ai_result
+
 @router.post("/whatsapp")
 async def whatsapp_webhook(
     payload: dict = Body(...),
@@ -31,19 +63,7 @@ async def whatsapp_webhook(
     )
     
     # Process with AI
-    active_incidents = TicketService.get_active_incidents(db)
-    active_incidents_data = [{"ticket_id": t.ticket_id, "summary": t.summary, "status": t.status} for t in active_incidents]
-    ai_result, raw_output, errors = await ai_service.analyze_issue(message, active_incidents_data)
-    
-    if not ai_result:
-        ai_result = {
-            "summary": "Manual Review Required - AI Failed",
-            "category": "Uncategorized",
-            "priority": "High",
-            "sentiment": "Neutral"
-        }
-    
-    ticket = await TicketService.create_ticket(db, ticket_data, ai_result, raw_output, errors)
+    ticket, ai_result = await _triage_and_create(db, ticket_data, message)
     
     return {
         "status": "success",
@@ -74,19 +94,7 @@ async def email_webhook(
     )
     
     # Process with AI
-    active_incidents = TicketService.get_active_incidents(db)
-    active_incidents_data = [{"ticket_id": t.ticket_id, "summary": t.summary, "status": t.status} for t in active_incidents]
-    ai_result, raw_output, errors = await ai_service.analyze_issue(full_message, active_incidents_data)
-    
-    if not ai_result:
-        ai_result = {
-            "summary": "Manual Review Required - AI Failed",
-            "category": "Uncategorized",
-            "priority": "High",
-            "sentiment": "Neutral"
-        }
-        
-    ticket = await TicketService.create_ticket(db, ticket_data, ai_result, raw_output, errors)
+    ticket, ai_result = await _triage_and_create(db, ticket_data, full_message)
     
     return {
         "status": "success", 
@@ -94,6 +102,63 @@ async def email_webhook(
         "ai_analysis": ai_result,
         "acknowledgment_message": f"Support Ticket {ticket.ticket_id} created for: {subject}. Priority: {ai_result['priority']}. Thanks for reaching out!"
     }
+
+@router.post("/email/raw")
+async def raw_email_webhook(request: Request, db: Session = Depends(get_db)):
+    """
+    Raw email intake: the request body is an RFC 822 message (message/rfc822),
+    or a multipart/form-data upload with the .eml in a "file" field.
+    Both forms are parsed as they stream in (the form is never spooled by the
+    framework) and the size cap stops the read; only the normalized plain-text body
+    is stored and triaged, attachments are spooled to disk and referenced.
+    """
+    parser = RawEmailParser()
+    content_type = request.headers.get("content-type", "")
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > parser.max_bytes + MULTIPART_OVERHEAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Email exceeds {parser.max_bytes} bytes")
+    try:
+        if content_type.startswith("multipart/form-data"):
+            try:
+                reader = MultipartEmailReader(content_type, parser)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            async for chunk in request.stream():
+                reader.feed(chunk)
+            reader.close()
+            if not reader.found:
+                raise HTTPException(status_code=400, detail="Missing file upload")
+        else:
+            async for chunk in request.stream():
+                parser.feed(chunk)
+        parsed = parser.close()
+    except EmailTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    if not parsed["sender"]:
+        raise HTTPException(status_code=400, detail="Missing From header")
+    if not parsed["text"] and not parsed["subject"]:
+        raise HTTPException(status_code=400, detail="Email has no text content")
+    
+    full_message = f"Subject: {parsed['subject']}\n\nBody: {parsed['text']}"
+    
+    ticket_data = schemas.TicketCreate(
+        source=schemas.TicketSource.EMAIL,
+        sender=parsed["sender"],
+        message=full_message
+    )
+    
+    ticket, ai_result = await _triage_and_create(db, ticket_data, full_message)
+    TicketService.add_attachments(db, ticket.ticket_id, parsed["attachments"])
+    
+    return {
+        "status": "success",
+        "ticket_id": ticket.ticket_id,
+        "ai_analysis": ai_result,
+        "attachments": len(parsed["attachments"]),
+        "acknowledgment_message": f"Support Ticket {ticket.ticket_id} created for: {parsed['subject']}. Priority: {ai_result['priority']}. Thanks for reaching out!"
+    }
+
 @router.post("/intake")
 async def intake_endpoint(
     payload: dict = Body(...),
@@ -121,19 +186,7 @@ async def intake_endpoint(
     )
     
     # Process with AI
-    active_incidents = TicketService.get_active_incidents(db)
-    active_incidents_data = [{"ticket_id": t.ticket_id, "summary": t.summary, "status": t.status} for t in active_incidents]
-    ai_result, raw_output, errors = await ai_service.analyze_issue(message, active_incidents_data)
-    
-    if not ai_result:
-        ai_result = {
-            "summary": "Manual Review Required - AI Failed",
-            "category": "Uncategorized",
-            "priority": "High",
-            "sentiment": "Neutral"
-        }
-    
-    ticket = await TicketService.create_ticket(db, ticket_data, ai_result, raw_output, errors)
+    ticket, ai_result = await _triage_and_create(db, ticket_data, message)
     
     return {
         "status": "success",
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime
 from enum import Enum
 
@@ -17,27 +17,56 @@ class TicketSource(str, Enum):
     EMAIL = "Email"
     WEBSITE = "Website"
 
+class AIPriority(str, Enum):
+    CRITICAL = "Critical"
+    HIGH = "High"
+    MEDIUM = "Medium"
+    LOW = "Low"
+    NONE = "None" # spam
+
+class AIDepartment(str, Enum):
+    NETWORK = "Network"
+    HARDWARE = "Hardware"
+    SOFTWARE = "Software"
+    ACCESS = "Access"
+
+class AISentiment(str, Enum):
+    CALM = "Calm"
+    FRUSTRATED = "Frustrated"
+    ANGRY = "Angry"
+
+class AITriageStatus(str, Enum):
+    CANCELLED = "Cancelled"
+    WAITING = "Waiting"
+    PROCESSING = "Processing"
+
+class AITicketRole(str, Enum):
+    PRIMARY = "Primary"
+    FOLLOWER = "Follower"
+
 class AIExtractionResult(BaseModel):
+    """Triage output expected from the model; also the source of the Gemini response schema."""
+    # Spam Detection & State Enforcement
+    is_spam: bool = False
+    enforced: bool = False
+    final_status: AITriageStatus = AITriageStatus.PROCESSING
+    reason: Optional[str] = Field(None, description="random_text | repeated_messages | no_intent")
+    # Triage
     summary: str = Field(..., description="A concise 1-sentence summary of the issue")
-    category: str = Field(..., description="Generic category")
-    priority: str = Field(..., description="Priority level: Low, Medium, High, Critical")
-    department: str = Field(..., description="Department: Network, Hardware, Software, Access")
-    sentiment: str = Field(..., description="User sentiment: Calm, Frustrated, Angry")
-    confidence_score: float = Field(default=1.0)
-    action: Optional[str] = "keep" # reroute | keep | flag_for_human
+    category: str = Field("Uncategorized", description="Generic category")
+    priority: AIPriority = AIPriority.MEDIUM
+    department: Optional[AIDepartment] = None
+    sentiment: Optional[AISentiment] = None
+    is_active: bool = True
+    # Input Completeness
+    is_complete: bool = True
+    clarification_question: Optional[str] = None
     # Swarm Detection
-    is_duplicate: Optional[bool] = False
+    is_duplicate: bool = False
     parent_incident_id: Optional[str] = None
-    ticket_role: Optional[str] = "Primary"
-    similarity_score: Optional[float] = 0.0
+    ticket_role: AITicketRole = AITicketRole.PRIMARY
+    similarity_score: int = Field(0, ge=0, le=100, description="Similarity to the parent incident, 0-100")
     swarm_reason: Optional[str] = None
-    # Input Completeness
-    is_complete: Optional[bool] = True
-    clarification_question: Optional[str] = None
-    # Spam Detection
-    is_spam: Optional[bool] = False
-    spam_reason: Optional[str] = None
-    is_active: Optional[bool] = True
     # Human Handoff Summary
     handoff_summary: Optional[str] = None
     ai_attempts: Optional[str] = None
@@ -48,6 +77,12 @@ class TicketCreate(BaseModel):
     sender: str
     message: str
 
+class TicketOperation(BaseModel):
+    """One item of a /tickets/batch request"""
+    ticket_id: str = Field(..., min_length=1)
+    op: Literal["status", "department", "assign"]
+    value: str = Field(..., min_length=1)
+
 class TicketResponse(BaseModel):
     id: int
     ticket_id: str
@@ -90,6 +125,61 @@ class TicketResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class TicketListItem(BaseModel):
+    """Compact row for list views: no large text columns."""
+    id: int
+    ticket_id: str
+    source: str
+    sender: str
+    summary: str
+    category: str
+    priority: str
+    department: Optional[str] = None
+    is_flagged: Optional[str] = "false"
+    reassigned_by: Optional[str] = None
+    is_duplicate: Optional[str] = "false"
+    parent_incident_id: Optional[str] = None
+    ticket_role: Optional[str] = "Primary"
+    similarity_score: Optional[int] = 0
+    is_complete: Optional[str] = "true"
+    clarification_question: Optional[str] = None
+    is_spam: Optional[str] = "false"
+    spam_reason: Optional[str] = None
+    sentiment: Optional[str] = "Neutral"
+    status: Optional[str] = "Received"
+    assigned_to: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class AttachmentResponse(BaseModel):
+    filename: Optional[str] = None
+    content_type: str
+    size_bytes: int
+    sha256: str
+    is_inline: Optional[str] = "false"
+    stored: bool = True
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class IncidentClusterResponse(BaseModel):
+    parent_incident_id: str
+    follower_count: int = 0
+    first_seen: Optional[datetime] = None
+    last_seen: Optional[datetime] = None
+    status: str = "Open"
+    last_update: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class IncidentClusterDetail(IncidentClusterResponse):
+    parent: Optional[TicketListItem] = None
+    followers: List[TicketListItem] = []
+
 class AnalyticsSummary(BaseModel):
     by_priority: dict
     by_source: dict
@@ -0,0 +1,285 @@
+from pydantic import TypeAdapter, ValidationError
+from enum import Enum
+from typing import get_args, get_origin, Union
+from ..schemas import AIExtractionResult
+import json
+import re
+
+AI_RESULT_ADAPTER = TypeAdapter(AIExtractionResult)
+
+# Values the model tends to produce instead of the enum members
+_SYNONYMS = {
+    "priority": {
+        "urgent": "Critical", "p1": "Critical", "blocker": "Critical",
+        "p2": "High", "major": "High",
+        "normal": "Medium", "moderate": "Medium", "p3": "Medium",
+        "minor": "Low", "trivial": "Low", "p4": "Low",
+        "null": "None", "n/a": "None"
+    },
+    "department": {
+        "networking": "Network", "internet": "Network", "wifi": "Network", "vpn": "Network",
+        "hw": "Hardware", "device": "Hardware",
+        "sw": "Software", "application": "Software", "app": "Software",
+        "accounts": "Access", "identity": "Access", "security": "Access", "permissions": "Access"
+    },
+    "sentiment": {"neutral": "Calm", "positive": "Calm", "annoyed": "Frustrated", "upset": "Frustrated", "furious": "Angry"},
+    "final_status": {"open": "Processing", "new": "Processing", "received": "Processing", "spam": "Cancelled", "closed": "Cancelled"}
+}
+# Keys older prompts used for the same fields
+_RENAMED = {"status": "final_status", "spam_reason": "reason"}
+_TRUE = {"true", "yes", "y", "1"}
+_FALSE = {"false", "no", "n", "0", "", "null", "none"}
+_FENCE = re.compile(r"^\s*```[a-zA-Z]*\s*|\s*```\s*$")
+
+
+def gemini_schema(model) -> dict:
+    """Pydantic JSON schema -> the OpenAPI subset Gemini's response_schema accepts (no $ref, anyOf, defaults or bounds)."""
+    schema = model.model_json_schema()
+    defs = schema.get("$defs", {})
+
+    def convert(node):
+        if "$ref" in node:
+            target = defs[node["$ref"].rsplit("/", 1)[-1]]
+            return convert({**target, **{k: v for k, v in node.items() if k != "$ref"}})
+        if "anyOf" in node:
+            options = [o for o in node["anyOf"] if o.get("type") != "null"]
+            out = convert(options[0])
+            out["nullable"] = len(options) < len(node["anyOf"])
+            if "description" in node:
+                out["description"] = node["description"]
+            return out
+        out = {"type": node["type"].upper()}
+        for key in ("description", "enum", "format"):
+            if key in node:
+                out[key] = node[key]
+        if node["type"] == "object":
+            out["properties"] = {name: convert(prop) for name, prop in node.get("properties", {}).items()}
+            # Ask for every key; optional ones may be null
+            out["required"] = list(out["properties"])
+        elif node["type"] == "array":
+            out["items"] = convert(node["items"])
+        return out
+
+    return convert(schema)
+
+
+def _field_kind(annotation):
+    """(base type, nullable) for a model field annotation"""
+    if get_origin(annotation) is Union:
+        args = [a for a in get_args(annotation) if a is not type(None)]
+        return args[0], True
+    return annotation, False
+
+
+class AIOutputParser:
+    """
+    Turns raw model output into a validated AIExtractionResult dict.
+
+    Problems that have an unambiguous fix are repaired locally - code fences,
+    truncated JSON (incomplete trailing members are dropped), stringified
+    booleans, enum values in the wrong case or as common synonyms, 0-1
+    similarity scores - and each repair is counted per field. Only output that
+    is still invalid after repair is reported back so the caller can re-ask.
+    """
+
+    def __init__(self):
+        self._fields = {name: (*_field_kind(f.annotation), f) for name, f in AIExtractionResult.model_fields.items()}
+        self.outcomes = {"clean": 0, "repaired": 0, "reasked": 0, "reask_recovered": 0, "failed": 0}
+        self.repairs = {}
+
+    def parse(self, text: str, count_failure: bool = True):
+        """
+        Returns (result dict or None, list of "field:repair" notes, error message or None).
+        Pass count_failure=False when a failure will be re-asked; record_reask() then counts
+        the message's final outcome.
+        """
+        notes = []
+        data = self._load(text or "", notes)
+        if not isinstance(data, dict):
+            return self._done(None, notes, "Output is not a JSON object", count_failure)
+
+        self._coerce(data, notes)
+        try:
+            result = AI_RESULT_ADAPTER.validate_python(data)
+        except ValidationError as e:
+            # Fields with a default are dropped back to it; a missing summary cannot be invented
+            unfixable = []
+            for error in e.errors():
+                field = error["loc"][0] if error["loc"] else None
+                if field in self._fields and not self._fields[field][2].is_required():
+                    data.pop(field, None)
+                    notes.append(f"{field}:invalid_default")
+                else:
+                    unfixable.append(f"{field}: {error['msg']}")
+            if unfixable:
+                return self._done(None, notes, "; ".join(unfixable), count_failure)
+            try:
+                result = AI_RESULT_ADAPTER.validate_python(data)
+            except ValidationError as e:
+                return self._done(None, notes, str(e), count_failure)
+        return self._done(result.model_dump(mode="json"), notes, None, count_failure)
+
+    def _done(self, result, notes, error, count_failure):
+        for note in notes:
+            field, _, kind = note.partition(":")
+            per_field = self.repairs.setdefault(field, {})
+            per_field[kind] = per_field.get(kind, 0) + 1
+        if result is None:
+            if count_failure:
+                self.outcomes["failed"] += 1
+        else:
+            self.outcomes["repaired" if notes else "clean"] += 1
+        return result, notes, error
+
+    def _load(self, text: str, notes: list):
+        stripped = text.strip()
+        if stripped.startswith("```"):
+            stripped = _FENCE.sub("", stripped)
+            notes.append("json:code_fence")
+        start = stripped.find("{")
+        if start < 0:
+            return None
+        if start > 0:
+            notes.append("json:leading_text")
+        try:
+            data, _ = json.JSONDecoder().raw_decode(stripped[start:])
+            return data
+        except ValueError:
+            pass
+        data = self._complete(stripped[start:])
+        if data is not None:
+            notes.append("json:truncated")
+        return data
+
+    @staticmethod
+    def _scan(text: str):
+        """Open containers, whether a string is open, and top-level member separators of a JSON prefix"""
+        stack, commas = [], []
+        in_string = escaped = False
+        for i, ch in enumerate(text):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch in "{[":
+                stack.append("}" if ch == "{" else "]")
+            elif ch in "}]" and stack:
+                stack.pop()
+            elif ch == "," and len(stack) == 1:
+                commas.append(i)
+        return stack, in_string, commas
+
+    def _complete(self, text: str):
+        """Close a JSON object that was cut off mid-stream, dropping its incomplete last member"""
+        _, _, commas = self._scan(text)
+        # The member being written when the output stopped may hold a partial value ("8" of "85"), so never trust it
+        for cut in reversed(commas):
+            candidate = text[:cut]
+            stack, in_string, _ = self._scan(candidate)
+            if in_string:
+                continue
+            try:
+                return json.loads(candidate + "".join(reversed(stack)))
+            except ValueError:
+                continue
+        return None
+
+    def _coerce(self, data: dict, notes: list):
+        for old, new in _RENAMED.items():
+            if old in data and new not in data:
+                data[new] = data.pop(old)
+                notes.append(f"{new}:renamed")
+
+        for name, (base, nullable, _) in self._fields.items():
+            if name not in data:
+                continue
+            value = data[name]
+            if isinstance(value, str) and nullable and value.strip().lower() in ("", "null", "none", "n/a"):
+                data[name] = None
+                notes.append(f"{name}:null_string")
+                continue
+            if value is None:
+                continue
+            if base is bool and not isinstance(value, bool):
+                value = self._bool(value)
+                if isinstance(value, bool):
+                    data[name] = value
+                    notes.append(f"{name}:stringified_bool")
+            elif isinstance(base, type) and issubclass(base, Enum):
+                data[name] = self._enum(name, base, value, nullable, notes)
+            elif name == "similarity_score":
+                data[name] = self._score(value, notes)
+            elif base is str and not isinstance(value, str):
+                data[name] = json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+                notes.append(f"{name}:not_string")
+
+        if not data.get("summary") and data.get("handoff_summary"):
+            data["summary"] = re.split(r"(?<=[.!?])\s", data["handoff_summary"].strip(), 1)[0]
+            notes.append("summary:derived")
+        if data.get("ticket_role") == "Follower" and not data.get("parent_incident_id"):
+            data["ticket_role"] = "Primary"
+            notes.append("ticket_role:orphan_follower")
+
+    @staticmethod
+    def _bool(value):
+        text = str(value).strip().lower()
+        if text in _TRUE:
+            return True
+        if text in _FALSE:
+            return False
+        return None  # left for validation to reject
+
+    def _enum(self, name, enum_cls, value, nullable, notes):
+        members = {m.value.lower(): m.value for m in enum_cls}
+        text = str(value).strip()
+        if text in members.values():
+            return text
+        if text.lower() in members:
+            notes.append(f"{name}:case")
+            return members[text.lower()]
+        synonym = _SYNONYMS.get(name, {}).get(text.lower())
+        if synonym in members.values():
+            notes.append(f"{name}:synonym")
+            return synonym
+        notes.append(f"{name}:out_of_enum")
+        if nullable:
+            return None
+        return self._fields[name][2].default.value
+
+    @staticmethod
+    def _score(value, notes):
+        try:
+            score = float(str(value).strip().rstrip("%"))
+        except ValueError:
+            notes.append("similarity_score:invalid_default")
+            return 0
+        if isinstance(value, str):
+            notes.append("similarity_score:stringified_number")
+        if 0 < score < 1:
+            score *= 100
+            notes.append("similarity_score:scale")
+        if score < 0 or score > 100:
+            score = min(max(score, 0), 100)
+            notes.append("similarity_score:clamped")
+        if score != int(score):
+            score = round(score)
+        return int(score)
+
+    def record_reask(self, recovered: bool):
+        """Outcome of a re-ask after a parse(count_failure=False) failure; unrecovered messages count as failed."""
+        self.outcomes["reasked"] += 1
+        if recovered:
+            self.outcomes["reask_recovered"] += 1
+        else:
+            self.outcomes["failed"] += 1
+
+    def get_stats(self):
+        return {"outcomes": dict(self.outcomes), "repairs_by_field": {k: dict(v) for k, v in self.repairs.items()}}
+
+
+ai_output_parser = AIOutputParser()
@@ -1,8 +1,11 @@
 import google.generativeai as genai
+import asyncio
 import json
 import os
+import time
 from dotenv import load_dotenv
 from ..schemas import AIExtractionResult
+from .ai_output_parser import AIOutputParser, ai_output_parser, gemini_schema
 import logging
 
 load_dotenv()
@@ -11,21 +14,71 @@ genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
 import traceback
 
+# Built once from the Pydantic model so the prompt, the API-side constraint and local validation agree
+RESPONSE_SCHEMA = gemini_schema(AIExtractionResult)
+
+AI_MODEL = os.getenv("AI_MODEL", "gemini-2.0-flash")
+PROMPT_VARIANTS = ("default", "compact")
+
+
+def _parse_costs(spec: str, default: dict):
+    """AI_MODEL_COSTS="gemini-2.0-flash=0.10/0.40" -> {"gemini-2.0-flash": (0.10, 0.40)}, USD per 1M input/output tokens"""
+    costs = dict(default)
+    for entry in (spec or "").split(","):
+        model, _, prices = entry.partition("=")
+        if model.strip() and "/" in prices:
+            prompt_price, _, output_price = prices.partition("/")
+            costs[model.strip()] = (float(prompt_price), float(output_price))
+    return costs
+
+
+MODEL_COSTS = _parse_costs(os.getenv("AI_MODEL_COSTS", ""), {
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-flash-8b": (0.0375, 0.15)
+})
+
+
+def estimate_cost(model_name: str, prompt_tokens: int, output_tokens: int):
+    """USD cost of one call, or None for models without a configured price"""
+    if model_name not in MODEL_COSTS:
+        return None
+    prompt_price, output_price = MODEL_COSTS[model_name]
+    return (prompt_tokens * prompt_price + output_tokens * output_price) / 1_000_000
+
 class AIService:
-    def __init__(self):
-        self.model = genai.GenerativeModel('gemini-2.0-flash') 
+    def __init__(self, model_name: str = AI_MODEL, prompt_variant: str = "default", output_parser: AIOutputParser = None):
+        if prompt_variant not in PROMPT_VARIANTS:
+            raise ValueError(f"Unknown prompt variant '{prompt_variant}'")
+        self.model_name = model_name
+        self.prompt_variant = prompt_variant
+        # Repair/outcome stats are per configuration; only the primary reports to /analytics/ai-repairs
+        self.output_parser = output_parser or AIOutputParser()
+        self.model = genai.GenerativeModel(model_name)
 
     async def analyze_issue(self, text: str, active_incidents: list = None):
+        run = await self.analyze(text, active_incidents)
+        return run["result"], run["raw_output"], run["errors"]
+
+    async def analyze(self, text: str, active_incidents: list = None):
+        """
+        Triage one message. Returns the result with its raw output and validation notes,
+        plus what the call cost (latency, token usage) so configurations can be compared.
+        """
+        run = {"model": self.model_name, "prompt_variant": self.prompt_variant, "fallback": False,
+               "latency_ms": 0.0, "prompt_tokens": 0, "output_tokens": 0, "cost_usd": None}
         key = os.getenv("GOOGLE_API_KEY")
         print(f"DEBUG: Entering analyze_issue. Key found: '{key[:10]}...'")
         
         # DEMO FALLBACK: If key is placeholder or doesn't start with AIza (basic check)
         if not key or key == "your_gemini_api_key_here" or key.startswith("your_"):
             print("DEBUG: Using demo fallback (Placeholder key)")
-            return self._get_demo_data(text), "DEMO_MODE_NO_API_KEY", "Gemini API key not configured. Using demo fallback."
+            return {**run, "fallback": True, "result": self._get_demo_data(text), "raw_output": "DEMO_MODE_NO_API_KEY",
+                    "errors": "Gemini API key not configured. Using demo fallback."}
 
+        started = time.perf_counter()
         try:
-            import asyncio
             print(f"DEBUG: Calling Unified Gemini AI Triage for: {text[:50]}...")
             
             incidents_str = "None"
@@ -35,7 +88,53 @@ class AIService:
                     "summary": i.get("summary")
                 } for i in active_incidents])
 
-            prompt = f"""
+            prompt = self._build_prompt(text, incidents_str)
+            
+            response_text = await self._generate(prompt, run)
+            result_json, repairs, error = self.output_parser.parse(response_text, count_failure=False)
+            
+            if result_json is None:
+                # Last resort: the output could not be repaired locally, so pay for one more call
+                print(f"DEBUG: AI output unusable ({error}), re-asking once")
+                recovered = False
+                try:
+                    response_text = await self._generate(
+                        f"{prompt}\n\nYour previous reply could not be used ({error}). "
+                        "Reply again with the complete JSON object only.",
+                        run
+                    )
+                    result_json, retry_repairs, error = self.output_parser.parse(response_text, count_failure=False)
+                    recovered = result_json is not None
+                finally:
+                    # One outcome per message: the first attempt is not counted as failed on its own
+                    self.output_parser.record_reask(recovered)
+                repairs = repairs + ["reask"] + retry_repairs
+                if result_json is None:
+                    raise Exception(f"AI output failed validation after re-ask: {error}")
+            
+            print("DEBUG: Unified AI Extraction Successful")
+            return {**run, "latency_ms": (time.perf_counter() - started) * 1000, "result": result_json,
+                    "raw_output": response_text, "errors": (f"Repaired: {', '.join(repairs)}" if repairs else None)}
+            
+        except Exception as e:
+            print(f"DEBUG: AI Extraction Error: {str(e)}")
+            traceback.print_exc()
+            logging.error(f"AI Extraction Error: {str(e)}")
+            return {**run, "fallback": True, "latency_ms": (time.perf_counter() - started) * 1000,
+                    "result": self._get_demo_data(text), "raw_output": "API_ERROR_FALLBACK", "errors": f"AI Error: {str(e)}"}
+
+    def _build_prompt(self, text: str, incidents_str: str):
+        if self.prompt_variant == "compact":
+            # Relies on response_schema for the output shape and keeps only the decision rules
+            return f"""Triage this IT support message and reply with JSON.
+Message: {text}
+Active incidents: {incidents_str}
+Spam (gibberish, repeated characters, no IT intent): is_spam=true, enforced=true, final_status=Cancelled, priority=None, department=null, sentiment=null, is_active=false, reason=random_text|repeated_messages|no_intent.
+Otherwise: final_status=Waiting with a clarification_question if information is missing, else Processing; priority Critical|High|Medium|Low; department Network|Hardware|Software|Access; sentiment Calm|Frustrated|Angry.
+If similarity_score > 80 with an active incident: is_duplicate=true, ticket_role=Follower, parent_incident_id=that id.
+handoff_summary, ai_attempts and next_best_action are short notes for the human agent."""
+
+        return f"""
             You are a Spam Detection and State Enforcement Agent for an IT Support Ticketing System.
             Your responsibility is to identify spam tickets and immediately enforce a non-active system state.
 
@@ -68,7 +167,7 @@ class AIService:
             - priority = High | Medium | Low
             - department = Network | Hardware | Software | Access
             - sentiment = Calm | Frustrated | Angry
-            - Swarm Detection: If similarity > 0.8 with an active incident, is_duplicate=true.
+            - Swarm Detection: If similarity_score > 80 with an active incident, is_duplicate=true.
 
             ### HUMAN HANDOFF SUMMARY
             Generate a structured summary for a human agent:
@@ -87,7 +186,7 @@ class AIService:
               "ai_attempts": "actions taken",
               "next_best_action": "step for human",
               "category": "category",
-              "priority": "High | Medium | Low | None",
+              "priority": "Critical | High | Medium | Low | None",
               "department": "Network | Hardware | Software | Access | null",
               "sentiment": "Calm | Frustrated | Angry | null",
               "is_active": true | false,
@@ -100,29 +199,27 @@ class AIService:
               "swarm_reason": "why"
             }}
             """
-            
-            try:
-                response = await asyncio.wait_for(
-                    self.model.generate_content_async(
-                        prompt,
-                        generation_config=genai.types.GenerationConfig(
-                            response_mime_type="application/json",
-                        )
-                    ),
-                    timeout=15.0
-                )
-            except asyncio.TimeoutError:
-                raise Exception("AI Request Timed Out")
-            
-            result_json = json.loads(response.text)
-            print("DEBUG: Unified AI Extraction Successful")
-            return result_json, response.text, None
-            
-        except Exception as e:
-            print(f"DEBUG: AI Extraction Error: {str(e)}")
-            traceback.print_exc()
-            logging.error(f"AI Extraction Error: {str(e)}")
-            return self._get_demo_data(text), "API_ERROR_FALLBACK", f"AI Error: {str(e)}"
+
+    async def _generate(self, prompt: str, run: dict):
+        try:
+            response = await asyncio.wait_for(
+                self.model.generate_content_async(
+                    prompt,
+                    generation_config=genai.types.GenerationConfig(
+                        response_mime_type="application/json",
+                        response_schema=RESPONSE_SCHEMA
+                    )
+                ),
+                timeout=15.0
+            )
+        except asyncio.TimeoutError:
+            raise Exception("AI Request Timed Out")
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            run["prompt_tokens"] += usage.prompt_token_count or 0
+            run["output_tokens"] += usage.candidates_token_count or 0
+            run["cost_usd"] = estimate_cost(self.model_name, run["prompt_tokens"], run["output_tokens"])
+        return response.text
 
     def _get_demo_data(self, text: str):
         # BASIC FALLBACK SPAM CHECK
@@ -158,4 +255,4 @@ class AIService:
             "swarm_reason": None
         }
 
-ai_service = AIService()
+ai_service = AIService(output_parser=ai_output_parser)
@@ -0,0 +1,326 @@
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+from .. import models
+from collections import deque
+from datetime import datetime, timedelta
+import math
+import os
+import re
+import threading
+
+load_dotenv()
+
+ANOMALY_BUCKET_SECONDS = int(os.getenv("ANOMALY_BUCKET_SECONDS", "60"))
+ANOMALY_HISTORY_BUCKETS = int(os.getenv("ANOMALY_HISTORY_BUCKETS", "180"))
+ANOMALY_ALPHA = float(os.getenv("ANOMALY_ALPHA", "0.05"))  # EWMA weight of each closed bucket
+ANOMALY_THRESHOLD = float(os.getenv("ANOMALY_THRESHOLD", "4"))  # standard deviations above the baseline
+ANOMALY_MIN_COUNT = int(os.getenv("ANOMALY_MIN_COUNT", "5"))  # per bucket, so a quiet key going 0 -> 2 is not an outage
+ANOMALY_WARMUP_BUCKETS = int(os.getenv("ANOMALY_WARMUP_BUCKETS", "30"))
+ANOMALY_COOLDOWN = timedelta(minutes=int(os.getenv("ANOMALY_COOLDOWN_MINUTES", "30")))
+ANOMALY_TOP_KEYWORDS = int(os.getenv("ANOMALY_TOP_KEYWORDS", "50"))
+ANOMALY_WARMUP_DAYS = int(os.getenv("ANOMALY_WARMUP_DAYS", "7"))
+
+SEASON_ALPHA = 0.1
+# An hour-of-day slot is trusted once it has seen a full hour of buckets
+SEASON_MIN_VISITS = max(1, 3600 // ANOMALY_BUCKET_SECONDS)
+# Keyword counts fade each bucket so the top-K reflects recent traffic, not all-time totals
+KEYWORD_DECAY = 0.98
+# Idle gaps longer than this are not replayed bucket by bucket
+MAX_CATCH_UP_BUCKETS = 24 * 3600 // ANOMALY_BUCKET_SECONDS
+
+_EPOCH = datetime(1970, 1, 1)
+_WORD = re.compile(r"[a-z][a-z0-9\-]{2,}")
+_STOPWORDS = {
+    "the", "and", "for", "not", "can", "but", "you", "any", "our", "was", "are", "has", "had", "its", "get",
+    "got", "now", "why", "how", "who", "all", "out", "too", "one", "did", "hey", "pls", "re:", "fwd",
+    "this", "that", "with", "from", "have", "been", "when", "what", "there", "their", "they", "will",
+    "would", "could", "should", "please", "help", "thanks", "thank", "hello", "since", "after", "before",
+    "about", "again", "still", "just", "also", "into", "your", "some", "does", "doesn", "cannot", "can't",
+    "working", "issue", "problem", "today", "morning", "subject", "body", "anyone", "need", "able"
+}
+# Which signal names the incident when several fire together, most specific first
+_PRECEDENCE = {"department": 0, "keyword": 1, "source": 2, "total": 3}
+
+
+def _bucket_of(at: datetime) -> int:
+    return int((at - _EPOCH).total_seconds()) // ANOMALY_BUCKET_SECONDS
+
+
+def _bucket_start(bucket: int) -> datetime:
+    return _EPOCH + timedelta(seconds=bucket * ANOMALY_BUCKET_SECONDS)
+
+
+def _hour(bucket: int) -> int:
+    return (bucket * ANOMALY_BUCKET_SECONDS // 3600) % 24
+
+
+class _Baseline:
+    """EWMA level and variance of a key's per-bucket count, plus an EWMA per hour of day."""
+    __slots__ = ("level", "var", "season", "season_seen", "buckets")
+
+    def __init__(self):
+        self.level = 0.0
+        self.var = 0.0
+        self.season = [0.0] * 24
+        self.season_seen = [0] * 24
+        self.buckets = 0
+
+    def expected(self, hour: int) -> float:
+        return self.season[hour] if self.season_seen[hour] >= SEASON_MIN_VISITS else self.level
+
+    def sd(self, hour: int) -> float:
+        # Counts are at least Poisson-noisy, so the spread never drops below sqrt(expected)
+        return math.sqrt(max(self.var, self.expected(hour), 1.0))
+
+    def update(self, count: float, hour: int):
+        residual = count - self.expected(hour)
+        self.var += ANOMALY_ALPHA * (residual * residual - self.var)
+        self.level += ANOMALY_ALPHA * (count - self.level)
+        if self.season_seen[hour]:
+            self.season[hour] += SEASON_ALPHA * (count - self.season[hour])
+        else:
+            self.season[hour] = count
+        self.season_seen[hour] += 1
+        self.buckets += 1
+
+
+class _SpaceSaving:
+    """Top-K heavy hitters in K counters; a newcomer replaces the smallest counter and inherits its count as error."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+
+    def add(self, item):
+        """Count one occurrence; returns the item evicted to make room, if any."""
+        if item in self.counts:
+            self.counts[item] += 1
+            return None
+        evicted = None
+        floor = 0
+        if len(self.counts) >= self.capacity:
+            evicted = min(self.counts, key=self.counts.get)
+            floor = self.counts.pop(evicted)
+            self.errors.pop(evicted)
+        self.counts[item] = floor + 1
+        self.errors[item] = floor
+        return evicted
+
+    def decay(self, factor: float):
+        for item in self.counts:
+            self.counts[item] *= factor
+            self.errors[item] *= factor
+
+    def top(self, n: int):
+        return sorted(self.counts.items(), key=lambda kv: -kv[1])[:n]
+
+
+class AnomalyDetector:
+    """
+    Streaming intake-rate anomaly detection.
+
+    Every non-spam intake is counted into the open time bucket under its total,
+    department, source and keywords. Keywords are limited to the current top-K
+    (Space-Saving), so memory is bounded no matter how varied the messages are.
+    When a bucket closes, each key's baseline (EWMA level/variance plus
+    hour-of-day seasonality) absorbs it, and per-department/source counts are
+    appended to a fixed-size ring of recent buckets. A key whose count in the
+    open bucket exceeds its baseline by ANOMALY_THRESHOLD deviations fires as
+    soon as it crosses, not when the bucket ends; each key then stays quiet for
+    ANOMALY_COOLDOWN.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bucket = None  # index of the open bucket
+        self._counts = {}  # (kind, key) -> count in the open bucket
+        self._departments = {}  # (kind, key) -> {department: count} in the open bucket
+        self._baselines = {}  # (kind, key) -> _Baseline
+        self._keywords = _SpaceSaving(ANOMALY_TOP_KEYWORDS)
+        self._series = deque(maxlen=ANOMALY_HISTORY_BUCKETS)  # (bucket, {(kind, key): count})
+        self._last_alert = {}  # (kind, key) -> datetime
+        self._incidents = {}  # department -> (ticket_id, opened_at) of the last auto-created incident
+        self.recent = deque(maxlen=50)
+        self.stats = {"observed": 0, "anomalies": 0, "incidents_opened": 0}
+
+    @staticmethod
+    def keywords_of(text: str):
+        words = set(_WORD.findall((text or "").lower()[:2000]))
+        return sorted(w for w in words if w not in _STOPWORDS)[:20]
+
+    def _advance(self, bucket: int):
+        if self._bucket is None:
+            self._bucket = bucket
+            return
+        if bucket - self._bucket > MAX_CATCH_UP_BUCKETS:
+            self._close(self._bucket)
+            self._bucket = bucket - MAX_CATCH_UP_BUCKETS
+        while self._bucket < bucket:
+            self._close(self._bucket)
+            self._bucket += 1
+
+    def _close(self, bucket: int):
+        hour = _hour(bucket)
+        for key, baseline in self._baselines.items():
+            count = self._counts.get(key, 0)
+            # An anomalous bucket is absorbed only up to the alert line, so one outage does not mask the next
+            ceiling = baseline.expected(hour) + ANOMALY_THRESHOLD * baseline.sd(hour)
+            baseline.update(min(count, ceiling) if baseline.buckets >= ANOMALY_WARMUP_BUCKETS else count, hour)
+        for key in self._counts:
+            if key not in self._baselines:
+                self._baselines[key] = _Baseline()
+                self._baselines[key].update(self._counts[key], hour)
+        self._series.append((bucket, {k: c for k, c in self._counts.items() if k[0] != "keyword"}))
+        self._counts, self._departments = {}, {}
+        self._keywords.decay(KEYWORD_DECAY)
+
+    def _forget_keyword(self, word: str):
+        key = ("keyword", word)
+        for table in (self._baselines, self._counts, self._departments, self._last_alert):
+            table.pop(key, None)
+
+    def observe(self, department: str, source: str, text: str = None, at: datetime = None, detect: bool = True):
+        """
+        Count one intake. Returns an anomaly dict when this arrival pushes a key over its
+        alert line (the most specific firing key names it, all firing keys are listed),
+        else None.
+        """
+        at = at or datetime.utcnow()
+        bucket = _bucket_of(at)
+        department = department or "Unassigned"
+        with self._lock:
+            self._advance(bucket)
+            if bucket < self._bucket:
+                return None  # arrived after its bucket closed
+            keys = [("total", "all"), ("department", department), ("source", source or "Website")]
+            words = []
+            for word in self.keywords_of(text) if text else ():
+                evicted = self._keywords.add(word)
+                if evicted is not None:
+                    self._forget_keyword(evicted)
+                words.append(word)
+            # A word evicted by a later word of the same message is no longer tracked, so it gets no count or baseline
+            keys += [("keyword", word) for word in words if word in self._keywords.counts]
+            for key in keys:
+                self._counts[key] = self._counts.get(key, 0) + 1
+                by_department = self._departments.setdefault(key, {})
+                by_department[department] = by_department.get(department, 0) + 1
+            self.stats["observed"] += 1
+            if not detect:
+                return None
+
+            signals = [s for s in (self._check(key, at) for key in keys) if s]
+            if not signals:
+                return None
+            signals.sort(key=lambda s: (_PRECEDENCE[s["kind"]], -s["z_score"]))
+            lead = signals[0]
+            incident = self._incidents.get(lead["department"])
+            anomaly = {
+                "event": "anomaly_detected",
+                **lead,
+                "signals": signals,
+                "window_seconds": ANOMALY_BUCKET_SECONDS,
+                "bucket_start": _bucket_start(bucket).isoformat(),
+                "detected_at": at.isoformat(),
+                # An incident already opened for this department within the cooldown is reused
+                "incident_id": incident[0] if incident and at - incident[1] < ANOMALY_COOLDOWN else None
+            }
+            self.recent.append(anomaly)
+            self.stats["anomalies"] += 1
+            return anomaly
+
+    def _check(self, key, at: datetime):
+        baseline = self._baselines.get(key)
+        if baseline is None or baseline.buckets < ANOMALY_WARMUP_BUCKETS:
+            return None
+        count = self._counts[key]
+        hour = _hour(self._bucket)
+        expected, sd = baseline.expected(hour), baseline.sd(hour)
+        if count < ANOMALY_MIN_COUNT or count < expected + ANOMALY_THRESHOLD * sd:
+            return None
+        last = self._last_alert.get(key)
+        if last and at - last < ANOMALY_COOLDOWN:
+            return None
+        self._last_alert[key] = at
+        by_department = self._departments.get(key, {})
+        return {
+            "kind": key[0],
+            "key": key[1],
+            "count": count,
+            "expected": round(expected, 2),
+            "z_score": round((count - expected) / sd, 2),
+            "department": max(by_department, key=by_department.get) if by_department else None
+        }
+
+    def link_incident(self, department: str, ticket_id: str, at: datetime = None):
+        with self._lock:
+            self._incidents[department] = (ticket_id, at or datetime.utcnow())
+            self.stats["incidents_opened"] += 1
+
+    def rebuild(self, db: Session, days: int = ANOMALY_WARMUP_DAYS):
+        """Warm department/source baselines from recent ticket history (keywords learn live)."""
+        since = datetime.utcnow() - timedelta(days=days)
+        rows = db.query(
+            models.Ticket.created_at, models.Ticket.department, models.Ticket.source
+        ).filter(
+            models.Ticket.created_at >= since,
+            models.Ticket.is_spam != "true"
+        ).order_by(models.Ticket.created_at).all()
+        with self._lock:
+            self._bucket, self._counts, self._departments = None, {}, {}
+            self._baselines, self._series = {}, deque(maxlen=ANOMALY_HISTORY_BUCKETS)
+            self._advance(_bucket_of(since))
+        for created_at, department, source in rows:
+            self.observe(department, source, at=created_at, detect=False)
+        with self._lock:
+            self._advance(_bucket_of(datetime.utcnow()))
+        return len(rows)
+
+    def series(self, kind: str = None, buckets: int = None):
+        """Recent per-bucket counts with the baseline each key is currently judged against."""
+        with self._lock:
+            self._advance(_bucket_of(datetime.utcnow()))
+            history = list(self._series)[-(buckets or ANOMALY_HISTORY_BUCKETS):]
+            current = (self._bucket, {k: c for k, c in self._counts.items() if k[0] != "keyword"})
+            hour = _hour(self._bucket)
+            keys = sorted({k for _, counts in history + [current] for k in counts if kind in (None, k[0])})
+            baselines = {k: self._baselines[k] for k in keys if k in self._baselines}
+            return {
+                "window_seconds": ANOMALY_BUCKET_SECONDS,
+                "buckets": [
+                    {"bucket_start": _bucket_start(b).isoformat(), "open": b == self._bucket,
+                     "counts": {f"{k[0]}:{k[1]}": c for k, c in counts.items() if k in keys}}
+                    for b, counts in history + [current]
+                ],
+                "baselines": {
+                    f"{k[0]}:{k[1]}": {
+                        "expected": round(b.expected(hour), 2),
+                        "alert_at": round(max(ANOMALY_MIN_COUNT, b.expected(hour) + ANOMALY_THRESHOLD * b.sd(hour)), 2),
+                        "warmed_up": b.buckets >= ANOMALY_WARMUP_BUCKETS
+                    } for k, b in baselines.items()
+                },
+                "top_keywords": [{"keyword": w, "count": round(c, 1)} for w, c in self._keywords.top(10)],
+                "recent_anomalies": list(self.recent)[-10:],
+                "stats": dict(self.stats)
+            }
+
+    def current_bucket(self) -> int:
+        """Index of the bucket that is filling now (changes every ANOMALY_BUCKET_SECONDS)"""
+        return _bucket_of(datetime.utcnow())
+
+    def volume_over_time(self, buckets: int = 60):
+        """Total intake per bucket for the analytics chart: [{"name", "bucket_start", "volume", "expected"}]"""
+        with self._lock:
+            self._advance(_bucket_of(datetime.utcnow()))
+            history = list(self._series)[-(buckets - 1):] + [(self._bucket, self._counts)]
+            baseline = self._baselines.get(("total", "all"))
+            return [{
+                "name": _bucket_start(b).strftime("%H:%M"),
+                "bucket_start": _bucket_start(b).isoformat(),
+                "volume": counts.get(("total", "all"), 0),
+                "expected": round(baseline.expected(_hour(b)), 2) if baseline else None
+            } for b, counts in history]
+
+
+anomaly_detector = AnomalyDetector()
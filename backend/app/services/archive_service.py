@@ -0,0 +1,281 @@
+from sqlalchemy import func, or_, and_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, undefer_group
+from sqlalchemy.types import DateTime
+from .. import models
+from ..database import ArchiveSessionLocal
+from .cache_service import response_cache, TAG_TICKETS, TAG_STATS
+from datetime import datetime, timedelta
+import json
+import logging
+
+ARCHIVABLE_STATUSES = [models.TicketStatus.RESOLVED.value, models.TicketStatus.CANCELLED.value]
+
+_DATETIME_COLUMNS = {c.name for c in models.Ticket.__table__.columns if isinstance(c.type, DateTime)}
+
+
+class ArchiveService:
+    """
+    Hot/cold tiering for tickets.
+
+    Closed tickets are copied into the archive DB as one row per ticket with a few
+    indexed lookup columns plus the full record as compressed JSON, then deleted
+    from the hot table. Each batch is committed to the archive before it is removed
+    from the hot table and archive inserts are idempotent, so an interrupted run can
+    simply be started again.
+    """
+
+    @staticmethod
+    def _pack(ticket: models.Ticket) -> str:
+        row = {}
+        for column in models.Ticket.__table__.columns:
+            value = getattr(ticket, column.name)
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            row[column.name] = value
+        return json.dumps(row)
+
+    @staticmethod
+    def _unpack_row(payload: str) -> dict:
+        row = json.loads(payload)
+        for name in _DATETIME_COLUMNS:
+            if row.get(name):
+                row[name] = datetime.fromisoformat(row[name])
+        return row
+
+    @staticmethod
+    def _unpack(payload: str) -> models.Ticket:
+        # Transient instance: serializes like a hot ticket but is never added to a session
+        return models.Ticket(**ArchiveService._unpack_row(payload))
+
+    @staticmethod
+    def archive_closed_tickets(db: Session, older_than_days: int = 30, batch_size: int = 500):
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        closed_at = func.coalesce(models.Ticket.resolved_at, models.Ticket.updated_at, models.Ticket.created_at)
+
+        archived = 0
+        batches = 0
+        ArchiveService.reconcile(db)
+        archive_db = ArchiveSessionLocal()
+        try:
+            while True:
+                tickets = db.query(models.Ticket).options(
+                    undefer_group(models.LARGE_TEXT)
+                ).filter(
+                    models.Ticket.status.in_(ARCHIVABLE_STATUSES),
+                    closed_at < cutoff
+                ).order_by(models.Ticket.id).limit(batch_size).all()
+                if not tickets:
+                    break
+
+                rows = []
+                for t in tickets:
+                    closed = t.resolved_at or t.updated_at or t.created_at
+                    rows.append({
+                        "ticket_id": t.ticket_id,
+                        "partition": closed.strftime("%Y-%m") if closed else "unknown",
+                        "source": t.source,
+                        "sender": t.sender,
+                        "status": t.status,
+                        "priority": t.priority,
+                        "department": t.department,
+                        "is_spam": t.is_spam,
+                        "assigned_to": t.assigned_to,
+                        "ticket_role": t.ticket_role or "Primary",
+                        "parent_incident_id": t.parent_incident_id,
+                        "summary": t.summary,
+                        "created_at": t.created_at,
+                        "assigned_at": t.assigned_at,
+                        "resolved_at": t.resolved_at,
+                        "archived_at": datetime.utcnow(),
+                        "payload": ArchiveService._pack(t),
+                    })
+
+                # Copy first, delete second: a failure in between leaves duplicates, never lost
+                # tickets. reconcile() removes them (here, at the next run and at startup)
+                # before the archive-folding reads can count them twice.
+                archive_db.execute(
+                    sqlite_insert(models.ArchivedTicket).on_conflict_do_nothing(index_elements=["ticket_id"]),
+                    rows
+                )
+                archive_db.commit()
+
+                ids = [t.id for t in tickets]
+                try:
+                    db.query(models.Ticket).filter(models.Ticket.id.in_(ids)).delete(synchronize_session=False)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    ArchiveService.reconcile(db)
+                    raise
+
+                archived += len(ids)
+                batches += 1
+        finally:
+            archive_db.close()
+
+        # Stats, admin history/performance and single-ticket views are unchanged (the archive is folded in), only lists shrink
+        if archived:
+            response_cache.invalidate(TAG_TICKETS)
+        return {"archived": archived, "batches": batches, "cutoff": cutoff.isoformat()}
+
+    @staticmethod
+    def reconcile(db: Session, batch_size: int = 500):
+        """Delete hot rows already copied to the archive (left behind by an interrupted run)."""
+        candidates = [tid for (tid,) in db.query(models.Ticket.ticket_id).filter(
+            models.Ticket.status.in_(ARCHIVABLE_STATUSES)
+        )]
+        removed = 0
+        archive_db = ArchiveSessionLocal()
+        try:
+            for start in range(0, len(candidates), batch_size):
+                chunk = candidates[start:start + batch_size]
+                copied = [tid for (tid,) in archive_db.query(models.ArchivedTicket.ticket_id).filter(
+                    models.ArchivedTicket.ticket_id.in_(chunk)
+                )]
+                if copied:
+                    removed += db.query(models.Ticket).filter(
+                        models.Ticket.ticket_id.in_(copied)
+                    ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            archive_db.close()
+        if removed:
+            logging.warning(f"Archive reconcile removed {removed} hot tickets already archived")
+            response_cache.invalidate(TAG_TICKETS, TAG_STATS)
+        return removed
+
+    @staticmethod
+    def get_ticket(ticket_id: str):
+        archive_db = ArchiveSessionLocal()
+        try:
+            row = archive_db.query(models.ArchivedTicket.payload).filter(
+                models.ArchivedTicket.ticket_id == ticket_id
+            ).first()
+            return ArchiveService._unpack(row.payload) if row else None
+        finally:
+            archive_db.close()
+
+    @staticmethod
+    def search(query: str, limit: int = 100):
+        """Match archived tickets on ticket id, sender or summary."""
+        pattern = f"%{query}%"
+        archive_db = ArchiveSessionLocal()
+        try:
+            rows = archive_db.query(models.ArchivedTicket.payload).filter(
+                or_(
+                    models.ArchivedTicket.ticket_id.ilike(pattern),
+                    models.ArchivedTicket.sender.ilike(pattern),
+                    models.ArchivedTicket.summary.ilike(pattern)
+                )
+            ).order_by(models.ArchivedTicket.created_at.desc()).limit(limit).all()
+            return [ArchiveService._unpack(r.payload) for r in rows]
+        finally:
+            archive_db.close()
+
+    @staticmethod
+    def iter_tickets(batch_size: int = 1000):
+        archive_db = ArchiveSessionLocal()
+        try:
+            last_id = ""
+            while True:
+                rows = archive_db.query(
+                    models.ArchivedTicket.ticket_id, models.ArchivedTicket.payload
+                ).filter(
+                    models.ArchivedTicket.ticket_id > last_id
+                ).order_by(models.ArchivedTicket.ticket_id).limit(batch_size).all()
+                if not rows:
+                    break
+                for r in rows:
+                    yield ArchiveService._unpack(r.payload)
+                last_id = rows[-1].ticket_id
+        finally:
+            archive_db.close()
+
+    @staticmethod
+    def get_counts():
+        """Grouped counts over the indexed archive columns, for folding into live stats."""
+        archive_db = ArchiveSessionLocal()
+        try:
+            return archive_db.query(
+                models.ArchivedTicket.priority,
+                models.ArchivedTicket.source,
+                models.ArchivedTicket.status,
+                models.ArchivedTicket.is_spam,
+                func.count()
+            ).group_by(
+                models.ArchivedTicket.priority,
+                models.ArchivedTicket.source,
+                models.ArchivedTicket.status,
+                models.ArchivedTicket.is_spam
+            ).all()
+        finally:
+            archive_db.close()
+
+    @staticmethod
+    def backfill_columns():
+        """Fill lookup columns added after rows were archived (assigned_at, ticket_role, parent_incident_id) from the stored payload."""
+        archive_db = ArchiveSessionLocal()
+        try:
+            # ticket_role is always set on new rows, so NULL marks a row archived before these columns existed
+            rows = archive_db.query(models.ArchivedTicket).filter(or_(
+                and_(models.ArchivedTicket.assigned_to.isnot(None), models.ArchivedTicket.assigned_at.is_(None)),
+                models.ArchivedTicket.ticket_role.is_(None)
+            )).all()
+            for r in rows:
+                ticket = ArchiveService._unpack_row(r.payload)
+                r.assigned_at = ticket.get("assigned_at")
+                r.ticket_role = ticket.get("ticket_role") or "Primary"
+                r.parent_incident_id = ticket.get("parent_incident_id")
+            archive_db.commit()
+            return len(rows)
+        finally:
+            archive_db.close()
+
+    @staticmethod
+    def get_resolved_by(admin_name: str):
+        """Archived tickets an admin resolved, newest first, as ticket column dicts."""
+        archive_db = ArchiveSessionLocal()
+        try:
+            rows = archive_db.query(models.ArchivedTicket.payload).filter(
+                models.ArchivedTicket.assigned_to == admin_name,
+                models.ArchivedTicket.status == models.TicketStatus.RESOLVED.value
+            ).order_by(models.ArchivedTicket.resolved_at.desc()).all()
+            return [ArchiveService._unpack_row(r.payload) for r in rows]
+        finally:
+            archive_db.close()
+
+    @staticmethod
+    def get_resolution_rows(admin_name: str):
+        """(priority, source, created_at, assigned_at, resolved_at) of archived tickets an admin resolved."""
+        archive_db = ArchiveSessionLocal()
+        try:
+            return archive_db.query(
+                models.ArchivedTicket.priority,
+                models.ArchivedTicket.source,
+                models.ArchivedTicket.created_at,
+                models.ArchivedTicket.assigned_at,
+                models.ArchivedTicket.resolved_at
+            ).filter(
+                models.ArchivedTicket.assigned_to == admin_name,
+                models.ArchivedTicket.status == models.TicketStatus.RESOLVED.value
+            ).all()
+        finally:
+            archive_db.close()
+
+    @staticmethod
+    def get_follower_counts():
+        """(parent_incident_id, followers, first created_at, last created_at) of archived Followers."""
+        archive_db = ArchiveSessionLocal()
+        try:
+            return archive_db.query(
+                models.ArchivedTicket.parent_incident_id,
+                func.count(models.ArchivedTicket.ticket_id),
+                func.min(models.ArchivedTicket.created_at),
+                func.max(models.ArchivedTicket.created_at)
+            ).filter(
+                models.ArchivedTicket.ticket_role == "Follower",
+                models.ArchivedTicket.parent_incident_id.isnot(None)
+            ).group_by(models.ArchivedTicket.parent_incident_id).all()
+        finally:
+            archive_db.close()
@@ -0,0 +1,150 @@
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+from .. import models
+import heapq
+import os
+import threading
+
+load_dotenv()
+
+OPEN_STATUSES = ["Processing", "Under Review", "Waiting"]
+PRIORITY_WEIGHTS = {"Critical": 4, "High": 3, "Medium": 2, "Low": 1}
+ANY_DEPARTMENT = "*"
+
+
+def parse_roster(spec: str):
+    """ADMIN_ROSTER="alice:Network|Software;bob:Hardware;carol:*" -> {"alice": {"Network", "Software"}, ...}"""
+    roster = {}
+    for entry in (spec or "").split(";"):
+        if not entry.strip():
+            continue
+        name, _, skills = entry.partition(":")
+        roster[name.strip()] = {s.strip() for s in (skills or ANY_DEPARTMENT).split("|") if s.strip()}
+    return roster
+
+
+class AssignmentEngine:
+    """
+    In-memory index of open work per admin, used to auto-assign new tickets.
+
+    Load is the sum of priority weights of an admin's open tickets. Each skill
+    (department, or "*" for generalists) keeps a min-heap of (load, admin); heap
+    entries are never updated in place - a load change pushes a fresh entry and
+    stale ones are discarded when they reach the top - so picking the
+    least-loaded qualified admin is O(log n).
+    """
+
+    def __init__(self, roster: dict, max_load: int = 0):
+        self.roster = roster
+        self.max_load = max_load  # 0 = unlimited
+        self._lock = threading.Lock()
+        self._open = {}  # ticket_id -> (admin, department, weight)
+        self._load = {}
+        self._by_department = {}
+        self._heaps = {}
+        self._reset_heaps()
+
+    def _reset_heaps(self):
+        self._heaps = {}
+        for admin, skills in self.roster.items():
+            for skill in skills:
+                self._heaps.setdefault(skill, []).append((self._load.get(admin, 0), admin))
+        for heap in self._heaps.values():
+            heapq.heapify(heap)
+
+    def _set_load(self, admin: str, load: int):
+        self._load[admin] = load
+        for skill in self.roster.get(admin, ()):
+            heapq.heappush(self._heaps[skill], (load, admin))
+        # Keep lazily-invalidated heaps from growing without bound
+        if any(len(h) > 4 * len(self.roster) + 16 for h in self._heaps.values()):
+            self._reset_heaps()
+
+    def _peek(self, skill: str):
+        heap = self._heaps.get(skill)
+        while heap:
+            load, admin = heap[0]
+            if self._load.get(admin, 0) == load:
+                return load, admin
+            heapq.heappop(heap)
+        return None
+
+    def rebuild(self, db: Session):
+        rows = db.query(
+            models.Ticket.ticket_id, models.Ticket.assigned_to, models.Ticket.department, models.Ticket.priority
+        ).filter(
+            models.Ticket.assigned_to.isnot(None),
+            models.Ticket.status.in_(OPEN_STATUSES)
+        ).all()
+        with self._lock:
+            self._open, self._load, self._by_department = {}, {}, {}
+            for ticket_id, admin, department, priority in rows:
+                self._add(ticket_id, admin, department, priority)
+            self._reset_heaps()
+        return len(rows)
+
+    def _add(self, ticket_id, admin, department, priority):
+        weight = PRIORITY_WEIGHTS.get(priority, 1)
+        self._open[ticket_id] = (admin, department, weight)
+        self._load[admin] = self._load.get(admin, 0) + weight
+        counts = self._by_department.setdefault(admin, {})
+        counts[department or "Unassigned"] = counts.get(department or "Unassigned", 0) + 1
+
+    def _remove(self, ticket_id):
+        admin, department, weight = self._open.pop(ticket_id)
+        counts = self._by_department[admin]
+        counts[department or "Unassigned"] -= 1
+        if not counts[department or "Unassigned"]:
+            del counts[department or "Unassigned"]
+        return admin, self._load[admin] - weight
+
+    def pick(self, department: str, priority: str):
+        """Least-loaded admin skilled for the department, or None if nobody has capacity."""
+        with self._lock:
+            candidates = [c for c in (self._peek(department), self._peek(ANY_DEPARTMENT)) if c]
+            if not candidates:
+                return None
+            load, admin = min(candidates)
+            # Critical tickets are assigned even when everyone is at capacity
+            if self.max_load and load >= self.max_load and priority != "Critical":
+                return None
+            return admin
+
+    def sync(self, rows):
+        """Apply the current (ticket_id, assigned_to, department, priority, status) of changed tickets."""
+        with self._lock:
+            for ticket_id, admin, department, priority, status in rows:
+                if ticket_id in self._open:
+                    previous, load = self._remove(ticket_id)
+                    self._set_load(previous, load)
+                if admin and status in OPEN_STATUSES:
+                    self._add(ticket_id, admin, department, priority)
+                    self._set_load(admin, self._load[admin])
+
+    def sync_tickets(self, db: Session, ticket_ids):
+        if not ticket_ids:
+            return
+        self.sync(db.query(
+            models.Ticket.ticket_id, models.Ticket.assigned_to, models.Ticket.department,
+            models.Ticket.priority, models.Ticket.status
+        ).filter(models.Ticket.ticket_id.in_(list(ticket_ids))).all())
+
+    def load_board(self):
+        with self._lock:
+            admins = set(self.roster) | set(self._load)
+            board = [{
+                "admin_name": admin,
+                "skills": sorted(self.roster.get(admin, ())),
+                "auto_assign": admin in self.roster,
+                "weighted_load": self._load.get(admin, 0),
+                "open_tickets": sum(self._by_department.get(admin, {}).values()),
+                "by_department": dict(self._by_department.get(admin, {}))
+            } for admin in admins]
+        board.sort(key=lambda a: (a["weighted_load"], a["admin_name"]))
+        return {"max_load": self.max_load or None, "admins": board}
+
+
+assignment_engine = AssignmentEngine(
+    parse_roster(os.getenv("ADMIN_ROSTER", "")),
+    max_load=int(os.getenv("ADMIN_MAX_LOAD", "0"))
+)
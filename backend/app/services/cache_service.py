@@ -0,0 +1,158 @@
+from collections import OrderedDict
+from dotenv import load_dotenv
+from urllib.parse import urlencode
+import os
+import threading
+import time
+
+load_dotenv()
+
+# Tags used by the read endpoints and invalidated by ticket mutations
+TAG_TICKETS = "tickets"  # any list/search/workspace/export view of ticket rows
+TAG_STATS = "stats"      # counts by status/priority/source
+
+
+def ticket_tag(ticket_id: str) -> str:
+    return f"ticket:{ticket_id}"
+
+
+class RedisBackend:
+    """Shared cache tier so several API workers reuse each other's entries and invalidations."""
+
+    def __init__(self, url: str):
+        import redis  # optional dependency, only needed when CACHE_REDIS_URL is set
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key: str):
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: int):
+        self.client.set(key, value, ex=ttl)
+
+    def get_int(self, key: str) -> int:
+        return int(self.client.get(key) or 0)
+
+    def incr(self, key: str) -> int:
+        return self.client.incr(key)
+
+
+class ResponseCache:
+    """
+    Read-through cache for serialized responses.
+
+    Entries are keyed by route, query params and the current generation of each
+    tag the response depends on. Invalidating a tag bumps its generation, so every
+    dependent key changes at once and stale entries simply age out of the LRU.
+    Concurrent misses on the same key are coalesced: one caller computes while
+    the others wait for its result.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: int = 300, shared=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "shared_hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0}
+
+    def _generation(self, tag: str) -> int:
+        if self.shared is not None:
+            return self.shared.get_int(f"nexus:gen:{tag}")
+        return self._generations.get(tag, 0)
+
+    def _key(self, route: str, params: dict, tags: list) -> str:
+        query = urlencode(sorted((k, v) for k, v in params.items() if v is not None))
+        generations = ",".join(f"{tag}@{self._generation(tag)}" for tag in tags)
+        return f"nexus:resp:{route}?{query}#{generations}"
+
+    def _get_local(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value: bytes):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_or_compute(self, route: str, params: dict, tags: list, compute) -> bytes:
+        key = self._key(route, params, tags)
+
+        with self._lock:
+            value = self._get_local(key)
+            if value is not None:
+                self.stats["hits"] += 1
+                return value
+            waiter = self._inflight.get(key)
+            if waiter is None:
+                waiter = self._inflight[key] = threading.Event()
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            waiter.wait(timeout=30)
+            with self._lock:
+                value = self._get_local(key)
+                # Served from the leader's result without computing: counts as a hit
+                self.stats["coalesced" if value is not None else "misses"] += 1
+            if value is not None:
+                return value
+            # Leader failed or timed out: compute independently rather than erroring
+            return compute()
+
+        try:
+            value = self.shared.get(key) if self.shared is not None else None
+            if value is not None:
+                with self._lock:
+                    self.stats["shared_hits"] += 1
+            else:
+                with self._lock:
+                    self.stats["misses"] += 1
+                value = compute()
+                if self.shared is not None:
+                    self.shared.set(key, value, self.ttl)
+            with self._lock:
+                self._set_local(key, value)
+            return value
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            waiter.set()
+
+    def invalidate(self, *tags: str):
+        with self._lock:
+            for tag in tags:
+                if self.shared is not None:
+                    self.shared.incr(f"nexus:gen:{tag}")
+                else:
+                    self._generations[tag] = self._generations.get(tag, 0) + 1
+                self.stats["invalidations"] += 1
+
+    def get_stats(self):
+        with self._lock:
+            served = self.stats["hits"] + self.stats["shared_hits"] + self.stats["coalesced"]
+            lookups = served + self.stats["misses"]
+            hit_ratio = served / lookups if lookups else 0.0
+            return {
+                **self.stats,
+                "hit_ratio": round(hit_ratio, 3),
+                "entries": len(self._entries),
+                "shared_tier": type(self.shared).__name__ if self.shared is not None else None
+            }
+
+
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "512")),
+    ttl=int(os.getenv("CACHE_TTL_SECONDS", "300")),
+    shared=RedisBackend(os.getenv("CACHE_REDIS_URL")) if os.getenv("CACHE_REDIS_URL") else None
+)
@@ -0,0 +1,222 @@
+from email import policy
+from email.parser import BytesFeedParser
+from email.utils import parseaddr
+from html.parser import HTMLParser
+from dotenv import load_dotenv
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+import hashlib
+import os
+import re
+
+load_dotenv()
+
+MAX_RAW_EMAIL_BYTES = int(os.getenv("MAX_RAW_EMAIL_BYTES", str(25 * 1024 * 1024)))
+MAX_ATTACHMENT_BYTES = int(os.getenv("MAX_ATTACHMENT_BYTES", str(10 * 1024 * 1024)))
+MAX_TRIAGE_CHARS = int(os.getenv("MAX_TRIAGE_CHARS", "4000"))
+ATTACHMENT_DIR = os.getenv("ATTACHMENT_DIR", "./attachments")
+# Room for the form boundaries, part headers and small fields around the uploaded .eml
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Lines where a reply stops being the sender's own text
+_REPLY_MARKERS = re.compile(
+    r"^(On .+ wrote:|-{2,}\s*Original Message\s*-{2,}|From: .+|Sent from my .+|-- ?)$",
+    re.IGNORECASE
+)
+
+
+class EmailTooLarge(Exception):
+    pass
+
+
+class _HTMLText(HTMLParser):
+    """Collects visible text from an HTML body, dropping script/style contents."""
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style", "head"):
+            self._skip += 1
+        elif tag in ("br", "p", "div", "tr", "li"):
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style", "head") and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    parser = _HTMLText()
+    parser.feed(html)
+    parser.close()
+    return "".join(parser.parts)
+
+
+def normalize_text(text: str, limit: int = MAX_TRIAGE_CHARS) -> str:
+    """Strip quoted history and signatures, collapse whitespace and cap the length sent to triage."""
+    lines = []
+    for line in text.replace("\r\n", "\n").replace("\r", "\n").split("\n"):
+        stripped = line.strip()
+        if _REPLY_MARKERS.match(stripped):
+            break
+        if stripped.startswith(">"):
+            continue
+        lines.append(re.sub(r"[ \t\u00a0]+", " ", stripped))
+    text = re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+    return text[:limit]
+
+
+class RawEmailParser:
+    """
+    Incremental RFC 822 / MIME parser with a hard size cap.
+
+    Chunks are fed as they arrive from the request stream (a multipart upload goes
+    through MultipartEmailReader) and the cap is checked before each one is parsed,
+    so an oversized upload is rejected without reading the rest. The parsed message (at most max_bytes) is held in memory until
+    close(); attachments are then decoded one part at a time, written to
+    ATTACHMENT_DIR under their SHA-256 (identical files are stored once) and
+    released, and only their metadata is returned. Parts over
+    MAX_ATTACHMENT_BYTES are recorded but not stored.
+    """
+
+    def __init__(self, max_bytes: int = MAX_RAW_EMAIL_BYTES):
+        self.max_bytes = max_bytes
+        self.received = 0
+        self._parser = BytesFeedParser(policy=policy.default)
+
+    def feed(self, chunk: bytes):
+        self.received += len(chunk)
+        if self.received > self.max_bytes:
+            raise EmailTooLarge(f"Email exceeds {self.max_bytes} bytes")
+        self._parser.feed(chunk)
+
+    def close(self):
+        message = self._parser.close()
+        sender = parseaddr(message.get("From", ""))[1] or message.get("From", "")
+        subject = str(message.get("Subject", "") or "")
+
+        body = message.get_body(preferencelist=("plain", "html"))
+        text = ""
+        if body is not None:
+            try:
+                text = body.get_content()
+            except LookupError:
+                # Unknown declared charset (e.g. unknown-8bit): decode what we can
+                text = (body.get_payload(decode=True) or b"").decode("utf-8", "replace")
+            if body.get_content_type() == "text/html":
+                text = html_to_text(text)
+
+        attachments = []
+        for part in message.walk():
+            if part.is_multipart() or part is body:
+                continue
+            if part.get_content_maintype() == "text" and not part.is_attachment():
+                continue  # alternative renderings of the body
+            attachments.append(self._spool(part))
+            part.set_payload("")  # release the decoded bytes as we go
+
+        return {
+            "sender": sender,
+            "subject": subject,
+            "text": normalize_text(text),
+            "attachments": attachments
+        }
+
+    def _spool(self, part):
+        data = part.get_payload(decode=True) or b""
+        meta = {
+            "filename": part.get_filename(),
+            "content_type": part.get_content_type(),
+            "size_bytes": len(data),
+            "is_inline": part.get_content_disposition() != "attachment",
+            "sha256": hashlib.sha256(data).hexdigest(),
+            "storage_path": None
+        }
+        if len(data) > MAX_ATTACHMENT_BYTES:
+            return meta
+
+        digest = meta["sha256"]
+        directory = os.path.join(ATTACHMENT_DIR, digest[:2])
+        path = os.path.join(directory, digest)
+        if not os.path.exists(path):
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{path}.part"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        meta["storage_path"] = path
+        return meta
+
+
+class MultipartEmailReader:
+    """
+    Streams a multipart/form-data body into a RawEmailParser without spooling it first.
+
+    The `field` part is fed to the email parser chunk by chunk as it arrives; every
+    byte of the request counts against the email cap plus MULTIPART_OVERHEAD_BYTES,
+    so other parts cannot be used to push unbounded data either.
+    """
+
+    def __init__(self, content_type: str, email_parser: RawEmailParser, field: str = "file"):
+        _, params = parse_options_header(content_type)
+        if not params.get(b"boundary"):
+            raise ValueError("Missing multipart boundary")
+        self.email_parser = email_parser
+        self.field = field.encode()
+        self.max_bytes = email_parser.max_bytes + MULTIPART_OVERHEAD_BYTES
+        self.received = 0
+        self.found = False
+        self._in_field = False
+        self._header_name = b""
+        self._header_value = b""
+        self._headers = {}
+        self._parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": lambda data, start, end: self._extend("_header_name", data[start:end]),
+            "on_header_value": lambda data, start, end: self._extend("_header_value", data[start:end]),
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end
+        })
+
+    def feed(self, chunk: bytes):
+        self.received += len(chunk)
+        if self.received > self.max_bytes:
+            raise EmailTooLarge(f"Email exceeds {self.email_parser.max_bytes} bytes")
+        self._parser.write(chunk)
+
+    def close(self):
+        self._parser.finalize()
+
+    def _extend(self, name: str, data: bytes):
+        setattr(self, name, getattr(self, name) + data)
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_end(self):
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name, self._header_value = b"", b""
+
+    def _on_headers_finished(self):
+        _, params = parse_options_header(self._headers.get(b"content-disposition", b""))
+        # Only the first matching part is the message; a repeated field is ignored
+        self._in_field = params.get(b"name") == self.field and not self.found
+        self.found = self.found or self._in_field
+
+    def _on_part_data(self, data, start, end):
+        if self._in_field:
+            self.email_parser.feed(data[start:end])
+
+    def _on_part_end(self):
+        self._in_field = False
@@ -0,0 +1,236 @@
+from sqlalchemy import func, or_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from .. import models
+from .websocket_manager import manager
+from .cache_service import response_cache, ticket_tag, TAG_TICKETS, TAG_STATS
+from .assignment_service import assignment_engine
+from .sla_service import sla_engine
+from .archive_service import ArchiveService
+from dotenv import load_dotenv
+from datetime import datetime
+import asyncio
+import httpx
+import logging
+import os
+
+load_dotenv()
+
+CLOSED_STATUSES = [models.TicketStatus.RESOLVED.value, models.TicketStatus.CANCELLED.value]
+
+
+def _parse_webhooks(spec: str) -> dict:
+    """INCIDENT_BROADCAST_WEBHOOKS="WhatsApp=https://n8n/webhook/a,Email=https://n8n/webhook/b" -> {channel: url}"""
+    hooks = {}
+    for entry in (spec or "").split(","):
+        channel, _, url = entry.partition("=")
+        if channel.strip() and url.strip():
+            hooks[channel.strip()] = url.strip()
+    return hooks
+
+
+# One outbound n8n webhook per channel; n8n sends the message with its WhatsApp/Gmail nodes
+BROADCAST_WEBHOOKS = _parse_webhooks(os.getenv("INCIDENT_BROADCAST_WEBHOOKS", ""))
+BROADCAST_TIMEOUT = float(os.getenv("INCIDENT_BROADCAST_TIMEOUT_SECONDS", "10"))
+
+
+class IncidentService:
+    """
+    Incident clusters: a Primary ticket plus the Followers that swarm detection
+    attached to it via parent_incident_id. Cluster-wide changes run as a single
+    set-based UPDATE and are announced with one aggregated WebSocket event.
+    """
+
+    @staticmethod
+    def record_follower(db: Session, parent_incident_id: str, seen_at: datetime = None):
+        """Upsert the cluster row for a new follower. Runs inside the caller's transaction."""
+        seen_at = seen_at or datetime.utcnow()
+        stmt = sqlite_insert(models.IncidentCluster).values(
+            parent_incident_id=parent_incident_id,
+            follower_count=1,
+            first_seen=seen_at,
+            last_seen=seen_at,
+            status="Open"
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["parent_incident_id"],
+            set_={
+                "follower_count": models.IncidentCluster.follower_count + 1,
+                "last_seen": stmt.excluded.last_seen,
+                "status": "Open",
+                "updated_at": seen_at
+            }
+        ))
+
+    @staticmethod
+    def rebuild_clusters(db: Session):
+        """Recompute every cluster from the tickets table and the archive, one grouped query each."""
+        live = db.query(
+            models.Ticket.parent_incident_id,
+            func.count(models.Ticket.id),
+            func.min(models.Ticket.created_at),
+            func.max(models.Ticket.created_at)
+        ).filter(
+            models.Ticket.ticket_role == "Follower",
+            models.Ticket.parent_incident_id.isnot(None)
+        ).group_by(models.Ticket.parent_incident_id).all()
+
+        # Archived followers still belong to their cluster; record_follower counted them when they arrived
+        merged = {}
+        for parent, count, first, last in list(live) + list(ArchiveService.get_follower_counts()):
+            if parent in merged:
+                total, seen_first, seen_last = merged[parent]
+                merged[parent] = (total + count, min(seen_first, first), max(seen_last, last))
+            else:
+                merged[parent] = (count, first, last)
+        rows = [(parent, *values) for parent, values in merged.items()]
+
+        db.query(models.IncidentCluster).update({models.IncidentCluster.follower_count: 0}, synchronize_session=False)
+        if rows:
+            stmt = sqlite_insert(models.IncidentCluster)
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=["parent_incident_id"],
+                set_={
+                    "follower_count": stmt.excluded.follower_count,
+                    "first_seen": stmt.excluded.first_seen,
+                    "last_seen": stmt.excluded.last_seen
+                }
+            ), [
+                {"parent_incident_id": parent, "follower_count": count, "first_seen": first, "last_seen": last}
+                for parent, count, first, last in rows
+            ])
+        db.commit()
+        return len(rows)
+
+    @staticmethod
+    def get_cluster(db: Session, parent_incident_id: str):
+        return db.query(models.IncidentCluster).filter(
+            models.IncidentCluster.parent_incident_id == parent_incident_id
+        ).first()
+
+    @staticmethod
+    def list_clusters(db: Session, status: str = None, limit: int = 50):
+        query = db.query(models.IncidentCluster)
+        if status:
+            query = query.filter(models.IncidentCluster.status == status)
+        return query.order_by(models.IncidentCluster.last_seen.desc()).limit(limit).all()
+
+    @staticmethod
+    def _members(parent_incident_id: str):
+        return or_(
+            models.Ticket.ticket_id == parent_incident_id,
+            models.Ticket.parent_incident_id == parent_incident_id
+        )
+
+    @staticmethod
+    def get_members(db: Session, parent_incident_id: str):
+        return db.query(models.Ticket).filter(
+            IncidentService._members(parent_incident_id)
+        ).order_by(models.Ticket.created_at).all()
+
+    @staticmethod
+    async def _apply(db: Session, cluster, action: str, values: dict, event_changes: dict):
+        result = db.execute(
+            update(models.Ticket).where(
+                IncidentService._members(cluster.parent_incident_id),
+                models.Ticket.status.notin_(CLOSED_STATUSES)
+            ).values(**values, updated_at=datetime.utcnow()).returning(models.Ticket.ticket_id)
+        )
+        ticket_ids = [row[0] for row in result]
+        if action == "resolve":
+            cluster.status = "Resolved"
+        db.commit()
+
+        if ticket_ids:
+            assignment_engine.sync_tickets(db, ticket_ids)
+            if "status" in values:
+                sla_engine.sync_tickets(db, ticket_ids)
+            tags = [TAG_TICKETS, *(ticket_tag(t) for t in ticket_ids)]
+            if "status" in values:
+                tags.append(TAG_STATS)
+            response_cache.invalidate(*tags)
+
+        await manager.broadcast({
+            "event": "incident_cluster_updated",
+            "parent_incident_id": cluster.parent_incident_id,
+            "action": action,
+            "affected": len(ticket_ids),
+            "ticket_ids": ticket_ids,
+            "changes": event_changes
+        })
+        return {"parent_incident_id": cluster.parent_incident_id, "action": action, "affected": len(ticket_ids), "ticket_ids": ticket_ids}
+
+    @staticmethod
+    async def resolve_cluster(db: Session, cluster):
+        now = datetime.utcnow()
+        return await IncidentService._apply(db, cluster, "resolve", {
+            "status": models.TicketStatus.RESOLVED.value,
+            "resolved_at": now
+        }, {"status": models.TicketStatus.RESOLVED.value})
+
+    @staticmethod
+    async def reassign_cluster(db: Session, cluster, admin_name: str = None, department: str = None):
+        values = {}
+        if admin_name:
+            values.update(assigned_to=admin_name, assigned_at=datetime.utcnow(), status=models.TicketStatus.PROCESSING.value)
+        if department:
+            values.update(department=department, reassigned_by="Human", is_flagged="false")
+        changes = {k: v for k, v in {"assigned_to": admin_name, "department": department}.items() if v}
+        return await IncidentService._apply(db, cluster, "reassign", values, changes)
+
+    @staticmethod
+    async def broadcast_update(db: Session, cluster, message: str):
+        """Send one update to every distinct sender in the cluster through the channel's n8n webhook."""
+        rows = db.query(models.Ticket.source, models.Ticket.sender).filter(
+            IncidentService._members(cluster.parent_incident_id)
+        ).distinct().all()
+
+        recipients = {}
+        for source, sender in rows:
+            if sender:
+                recipients.setdefault(source or "Website", []).append(sender)
+
+        cluster.last_update = message
+        db.commit()
+
+        channels = list(recipients)
+        results = await asyncio.gather(*[
+            IncidentService._deliver(cluster.parent_incident_id, channel, recipients[channel], message)
+            for channel in channels
+        ])
+        delivery = dict(zip(channels, results))
+
+        await manager.broadcast({
+            "event": "incident_broadcast",
+            "parent_incident_id": cluster.parent_incident_id,
+            "message": message,
+            "recipients": recipients,
+            "delivery": delivery
+        })
+        return {
+            "parent_incident_id": cluster.parent_incident_id,
+            "recipient_count": sum(len(v) for v in recipients.values()),
+            "delivered_count": sum(len(recipients[c]) for c, status in delivery.items() if status == "sent"),
+            "recipients": recipients,
+            "delivery": delivery
+        }
+
+    @staticmethod
+    async def _deliver(parent_incident_id: str, channel: str, senders: list, message: str) -> str:
+        """POST one channel's recipients to its n8n webhook; returns "sent", "not_configured" or "failed: ..." """
+        url = BROADCAST_WEBHOOKS.get(channel)
+        if not url:
+            return "not_configured"
+        try:
+            async with httpx.AsyncClient(timeout=BROADCAST_TIMEOUT) as client:
+                response = await client.post(url, json={
+                    "parent_incident_id": parent_incident_id,
+                    "channel": channel,
+                    "recipients": senders,
+                    "message": message
+                })
+                response.raise_for_status()
+            return "sent"
+        except httpx.HTTPError as e:
+            logging.warning(f"Incident broadcast to {channel} failed: {e}")
+            return f"failed: {e}"
@@ -0,0 +1,298 @@
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, load_only
+from dotenv import load_dotenv
+from .. import models
+from ..database import SessionLocal
+from .ai_service import AIService
+from .write_batcher import write_batcher
+from datetime import datetime, timedelta
+import asyncio
+import bisect
+import logging
+import os
+import random
+import uuid
+
+load_dotenv()
+
+# Primary tickets created this long before a replayed ticket stand in for the incidents that were active then
+REPLAY_INCIDENT_WINDOW = timedelta(hours=int(os.getenv("SHADOW_REPLAY_INCIDENT_HOURS", "24")))
+DECISIONS = ("priority", "department", "spam", "duplicate")
+
+
+def parse_candidates(spec: str):
+    """SHADOW_CANDIDATES="lite=gemini-2.0-flash-lite:compact;flash-compact=gemini-2.0-flash:compact" -> {name: (model, prompt variant)}"""
+    candidates = {}
+    for entry in (spec or "").split(";"):
+        name, _, target = entry.partition("=")
+        if not name.strip() or not target.strip():
+            continue
+        model, _, variant = target.partition(":")
+        candidates[name.strip()] = (model.strip(), variant.strip() or "default")
+    return candidates
+
+
+def decisions(priority, department, is_spam, is_duplicate):
+    """The triage decisions compared between configurations, normalized the way tickets store them"""
+    spam = str(is_spam).lower() == "true"
+    return {
+        "priority": "None" if spam else priority,
+        "department": None if spam else department,
+        "spam": spam,
+        "duplicate": str(is_duplicate).lower() == "true"
+    }
+
+
+def _percentile(values: list, q: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 1)
+
+
+class ShadowService:
+    """
+    Runs candidate triage configurations (model + prompt variant) next to the primary one.
+
+    Live: a SHADOW_SAMPLE_RATE share of intakes is mirrored to every candidate in a
+    background task after the ticket has been created, so the response path never
+    waits on it; when SHADOW_MAX_CONCURRENCY mirrors are already in flight new ones
+    are skipped rather than queued. Replay: historical tickets are re-triaged
+    concurrently and compared with the decisions stored on the ticket. Both write
+    ShadowResult rows (latency, tokens, cost, per-decision agreement) for report().
+    """
+
+    def __init__(self, candidates: dict, sample_rate: float = 0.0, max_concurrency: int = 4):
+        self.candidates = {name: AIService(model, variant) for name, (model, variant) in candidates.items()}
+        self.sample_rate = sample_rate
+        self.max_concurrency = max_concurrency
+        self._inflight = 0
+        self._tasks = set()
+        self.stats = {"mirrored": 0, "skipped_busy": 0, "replayed": 0}
+
+    def _select(self, names=None):
+        if not names:
+            return self.candidates
+        unknown = set(names) - set(self.candidates)
+        if unknown:
+            raise ValueError(f"Unknown shadow candidates: {', '.join(sorted(unknown))}")
+        return {name: self.candidates[name] for name in names}
+
+    def mirror(self, ticket, text: str, active_incidents: list, primary_run: dict):
+        """Schedule a shadow comparison for a just-created ticket; returns immediately."""
+        if not self.candidates or primary_run["fallback"] or random.random() >= self.sample_rate:
+            return
+        if self._inflight >= self.max_concurrency:
+            self.stats["skipped_busy"] += 1
+            return
+        self.stats["mirrored"] += 1
+        self._inflight += 1
+        primary = decisions(ticket.priority, ticket.department, ticket.is_spam, ticket.is_duplicate)
+        baseline = self._row(ticket.ticket_id, "primary", primary_run, primary, "live", None)
+        task = asyncio.create_task(self._compare(
+            ticket.ticket_id, text, active_incidents, primary, self.candidates, "live", None, [baseline]
+        ))
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task):
+        self._tasks.discard(task)
+        self._inflight -= 1
+
+    async def _compare(self, ticket_id, text, active_incidents, primary, candidates, mode, run_id, rows=None):
+        try:
+            runs = await asyncio.gather(*(c.analyze(text, active_incidents) for c in candidates.values()))
+            rows = (rows or []) + [
+                self._row(ticket_id, name, run, primary, mode, run_id) for name, run in zip(candidates, runs)
+            ]
+            await self._store(rows)
+        except Exception as e:
+            logging.error(f"Shadow comparison for {ticket_id} failed: {str(e)}")
+
+    @staticmethod
+    def _row(ticket_id, candidate, run, primary, mode, run_id):
+        row = {
+            "ticket_id": ticket_id,
+            "mode": mode,
+            "run_id": run_id,
+            "candidate": candidate,
+            "model": run["model"],
+            "prompt_variant": run["prompt_variant"],
+            "latency_ms": round(run["latency_ms"], 1),
+            "prompt_tokens": run["prompt_tokens"],
+            "output_tokens": run["output_tokens"],
+            "cost_usd": run["cost_usd"],
+            "error": run["errors"] if run["fallback"] else None,
+            "output": run["raw_output"],
+            "created_at": datetime.utcnow()
+        }
+        if run["fallback"]:
+            # Demo data is not a decision by the candidate, so it neither agrees nor disagrees
+            return {**row, **{f"{d}_match": None for d in DECISIONS}}
+        result = run["result"]
+        ours = decisions(result.get("priority"), result.get("department"), result.get("is_spam"), result.get("is_duplicate"))
+        return {**row, **{f"{d}_match": ours[d] == primary[d] for d in DECISIONS}}
+
+    @staticmethod
+    def store_rows(db: Session, payloads: list):
+        """write_batcher handler: each payload is a list of ShadowResult rows"""
+        rows = [row for payload in payloads for row in payload]
+        if rows:
+            db.execute(insert(models.ShadowResult), rows)
+        return [None] * len(payloads)
+
+    async def _store(self, rows: list):
+        if write_batcher.running:
+            await write_batcher.submit("shadow_results", rows)
+            return
+        db = SessionLocal()
+        try:
+            self.store_rows(db, [rows])
+            db.commit()
+        finally:
+            db.close()
+
+    async def replay(self, candidate_names: list = None, limit: int = 100, since_days: int = None,
+                     concurrency: int = 4, run_id: str = None):
+        """
+        Re-triage up to `limit` historical tickets (newest first) through the candidates,
+        at most `concurrency` at a time, comparing against the decisions stored on each
+        ticket. Returns the report for the run.
+        """
+        candidates = self._select(candidate_names)
+        if not candidates:
+            raise ValueError("No shadow candidates configured (SHADOW_CANDIDATES)")
+        run_id = run_id or f"REPLAY-{uuid.uuid4().hex[:8].upper()}"
+
+        db = SessionLocal()
+        try:
+            query = db.query(models.Ticket).options(load_only(
+                models.Ticket.ticket_id, models.Ticket.original_message, models.Ticket.priority,
+                models.Ticket.department, models.Ticket.is_spam, models.Ticket.is_duplicate,
+                models.Ticket.created_at
+            )).filter(models.Ticket.original_message.isnot(None))
+            if since_days is not None:
+                query = query.filter(models.Ticket.created_at >= datetime.utcnow() - timedelta(days=since_days))
+            tickets = query.order_by(models.Ticket.created_at.desc()).limit(limit).all()
+
+            incidents = db.query(
+                models.Ticket.created_at, models.Ticket.ticket_id, models.Ticket.summary
+            ).filter(
+                models.Ticket.ticket_role == "Primary",
+                models.Ticket.is_spam != "true",
+                models.Ticket.created_at.isnot(None)
+            ).order_by(models.Ticket.created_at).all()
+        finally:
+            db.close()
+        incident_times = [i.created_at for i in incidents]
+
+        def active_at(ticket):
+            if ticket.created_at is None:
+                return []
+            lo = bisect.bisect_left(incident_times, ticket.created_at - REPLAY_INCIDENT_WINDOW)
+            hi = bisect.bisect_left(incident_times, ticket.created_at)
+            return [{"ticket_id": i.ticket_id, "summary": i.summary} for i in incidents[lo:hi][-20:]]
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(ticket):
+            async with semaphore:
+                primary = decisions(ticket.priority, ticket.department, ticket.is_spam, ticket.is_duplicate)
+                await self._compare(ticket.ticket_id, ticket.original_message, active_at(ticket), primary,
+                                    candidates, "replay", run_id)
+
+        await asyncio.gather(*(one(t) for t in tickets))
+        self.stats["replayed"] += len(tickets)
+
+        db = SessionLocal()
+        try:
+            return {"run_id": run_id, "tickets": len(tickets), **self.report(db, mode="replay", run_id=run_id)}
+        finally:
+            db.close()
+
+    def start_replay(self, candidate_names: list = None, limit: int = 100, since_days: int = None, concurrency: int = 4):
+        """Schedule replay() in the background; returns the run id to poll report() with."""
+        if not self._select(candidate_names):
+            raise ValueError("No shadow candidates configured (SHADOW_CANDIDATES)")
+        run_id = f"REPLAY-{uuid.uuid4().hex[:8].upper()}"
+        task = asyncio.create_task(self.replay(candidate_names, limit, since_days, concurrency, run_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._replay_finished)
+        return run_id
+
+    def _replay_finished(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logging.error(f"Shadow replay failed: {str(task.exception())}")
+
+    def report(self, db: Session, mode: str = None, run_id: str = None, since_days: int = None):
+        """Per-candidate latency, token usage, cost and agreement with the primary decisions."""
+        query = db.query(
+            models.ShadowResult.candidate, models.ShadowResult.model, models.ShadowResult.prompt_variant,
+            models.ShadowResult.latency_ms, models.ShadowResult.prompt_tokens, models.ShadowResult.output_tokens,
+            models.ShadowResult.cost_usd, models.ShadowResult.error,
+            *(getattr(models.ShadowResult, f"{d}_match") for d in DECISIONS)
+        )
+        if mode:
+            query = query.filter(models.ShadowResult.mode == mode)
+        if run_id:
+            query = query.filter(models.ShadowResult.run_id == run_id)
+        if since_days is not None:
+            query = query.filter(models.ShadowResult.created_at >= datetime.utcnow() - timedelta(days=since_days))
+
+        groups = {}
+        for row in query:
+            groups.setdefault(row.candidate, []).append(row)
+
+        candidates = []
+        for name, rows in groups.items():
+            ok = [r for r in rows if r.error is None]
+            latencies = [r.latency_ms for r in ok if r.latency_ms is not None]
+            costs = [r.cost_usd for r in ok if r.cost_usd is not None]
+            agreement = {}
+            if name != "primary":
+                for d in DECISIONS:
+                    matches = [getattr(r, f"{d}_match") for r in ok if getattr(r, f"{d}_match") is not None]
+                    agreement[d] = round(sum(matches) / len(matches), 3) if matches else None
+                full = [r for r in ok if all(getattr(r, f"{d}_match") is not None for d in DECISIONS)]
+                agreement["all"] = round(
+                    sum(all(getattr(r, f"{d}_match") for d in DECISIONS) for r in full) / len(full), 3
+                ) if full else None
+            candidates.append({
+                "candidate": name,
+                "model": rows[-1].model,
+                "prompt_variant": rows[-1].prompt_variant,
+                "runs": len(rows),
+                "errors": len(rows) - len(ok),
+                "latency_ms": {
+                    "p50": _percentile(latencies, 0.5),
+                    "p95": _percentile(latencies, 0.95),
+                    "mean": round(sum(latencies) / len(latencies), 1) if latencies else None
+                },
+                "avg_prompt_tokens": round(sum(r.prompt_tokens or 0 for r in ok) / len(ok), 1) if ok else None,
+                "avg_output_tokens": round(sum(r.output_tokens or 0 for r in ok) / len(ok), 1) if ok else None,
+                "cost_usd": round(sum(costs), 6) if costs else None,
+                "cost_per_1k_tickets_usd": round(1000 * sum(costs) / len(costs), 4) if costs else None,
+                "agreement": agreement or None
+            })
+        candidates.sort(key=lambda c: (c["candidate"] != "primary", c["candidate"]))
+        return {"candidates": candidates}
+
+    def get_config(self):
+        return {
+            "sample_rate": self.sample_rate,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._inflight,
+            "configured": {name: {"model": c.model_name, "prompt_variant": c.prompt_variant} for name, c in self.candidates.items()},
+            "stats": dict(self.stats),
+            "parser": {name: c.output_parser.get_stats()["outcomes"] for name, c in self.candidates.items()}
+        }
+
+
+shadow_service = ShadowService(
+    parse_candidates(os.getenv("SHADOW_CANDIDATES", "")),
+    sample_rate=float(os.getenv("SHADOW_SAMPLE_RATE", "0.1")),
+    max_concurrency=int(os.getenv("SHADOW_MAX_CONCURRENCY", "4"))
+)
+
+write_batcher.register("shadow_results", ShadowService.store_rows)
@@ -0,0 +1,182 @@
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+from .. import models
+from .websocket_manager import manager
+from datetime import datetime, timedelta
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import threading
+
+load_dotenv()
+
+SLA_OPEN_STATUSES = ["Received", "Processing", "Under Review", "Waiting"]
+
+
+def _parse_hours(spec: str, default: dict):
+    """SLA_HOURS="Critical=4,High=8" -> {"Critical": 4.0, "High": 8.0, ...} on top of the defaults"""
+    hours = dict(default)
+    for entry in (spec or "").split(","):
+        key, _, value = entry.partition("=")
+        if key.strip() and value.strip():
+            hours[key.strip()] = float(value)
+    return hours
+
+
+SLA_HOURS = _parse_hours(os.getenv("SLA_HOURS", ""), {"Critical": 4, "High": 8, "Medium": 24, "Low": 72})
+# Email is asynchronous by nature, so it gets a longer window than chat/web
+SLA_SOURCE_FACTORS = _parse_hours(os.getenv("SLA_SOURCE_FACTORS", ""), {"WhatsApp": 1.0, "Website": 1.0, "Email": 1.5})
+SLA_WARNING_RATIO = float(os.getenv("SLA_WARNING_RATIO", "0.75"))
+
+
+def sla_window(priority: str, source: str) -> timedelta:
+    hours = SLA_HOURS.get(priority, SLA_HOURS["Medium"]) * SLA_SOURCE_FACTORS.get(source, 1.0)
+    return timedelta(hours=hours)
+
+
+class SLAEngine:
+    """
+    Pending SLA deadlines for open tickets, held in a min-heap keyed by fire time.
+
+    Each tracked ticket has a warning entry (SLA_WARNING_RATIO of the window) and a
+    breach entry. Rescheduling or closing a ticket bumps its generation, which
+    turns its old heap entries into no-ops, so nothing is ever removed from the
+    middle of the heap. A single task sleeps until the earliest entry and is
+    woken early when an earlier deadline is scheduled; the DB is never polled.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._tracked = {}  # ticket_id -> (generation, priority, source, deadline)
+        self._breached = set()
+        self._generations = itertools.count(1)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._loop = None
+        self._wakeup = None
+        self.stats = {"sla_warning": 0, "sla_breached": 0}
+
+    def _schedule(self, ticket_id, created_at, priority, source, fire_past: bool):
+        current = self._tracked.get(ticket_id)
+        if current and current[1] == priority and current[2] == source:
+            return False
+        generation = next(self._generations)
+        window = sla_window(priority, source)
+        deadline = created_at + window
+        self._tracked[ticket_id] = (generation, priority, source, deadline)
+        self._breached.discard(ticket_id)
+
+        now = datetime.utcnow()
+        for kind, fire_at in (("sla_warning", created_at + window * SLA_WARNING_RATIO), ("sla_breached", deadline)):
+            if fire_at <= now and not fire_past:
+                if kind == "sla_breached":
+                    self._breached.add(ticket_id)
+                continue
+            heapq.heappush(self._heap, (fire_at, next(self._seq), ticket_id, kind, generation))
+        return True
+
+    def _cancel(self, ticket_id):
+        self._tracked.pop(ticket_id, None)
+        self._breached.discard(ticket_id)
+
+    def _wake(self):
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def rebuild(self, db: Session):
+        rows = db.query(
+            models.Ticket.ticket_id, models.Ticket.created_at, models.Ticket.priority, models.Ticket.source
+        ).filter(
+            models.Ticket.status.in_(SLA_OPEN_STATUSES),
+            models.Ticket.is_spam != "true"
+        ).all()
+        with self._lock:
+            self._heap, self._tracked, self._breached = [], {}, set()
+            for ticket_id, created_at, priority, source in rows:
+                # Deadlines that passed while the server was down are recorded, not re-announced
+                self._schedule(ticket_id, created_at or datetime.utcnow(), priority, source, fire_past=False)
+        self._wake()
+        return len(rows)
+
+    def sync(self, rows):
+        """Apply the current (ticket_id, status, priority, source, created_at, is_spam) of changed tickets."""
+        changed = False
+        with self._lock:
+            for ticket_id, status, priority, source, created_at, is_spam in rows:
+                if status in SLA_OPEN_STATUSES and is_spam != "true":
+                    changed |= self._schedule(ticket_id, created_at or datetime.utcnow(), priority, source, fire_past=True)
+                else:
+                    self._cancel(ticket_id)
+        if changed:
+            self._wake()
+
+    def sync_tickets(self, db: Session, ticket_ids):
+        if not ticket_ids:
+            return
+        self.sync(db.query(
+            models.Ticket.ticket_id, models.Ticket.status, models.Ticket.priority,
+            models.Ticket.source, models.Ticket.created_at, models.Ticket.is_spam
+        ).filter(models.Ticket.ticket_id.in_(list(ticket_ids))).all())
+
+    def _pop_due(self, now: datetime):
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                fire_at, _, ticket_id, kind, generation = heapq.heappop(self._heap)
+                tracked = self._tracked.get(ticket_id)
+                if not tracked or tracked[0] != generation:
+                    continue  # ticket closed or rescheduled since this entry was pushed
+                if kind == "sla_breached":
+                    self._breached.add(ticket_id)
+                due.append({
+                    "event": kind,
+                    "ticket_id": ticket_id,
+                    "priority": tracked[1],
+                    "source": tracked[2],
+                    "deadline": tracked[3].isoformat()
+                })
+            next_at = self._heap[0][0] if self._heap else None
+        return due, next_at
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                # Clear before popping so a wake-up that races with this pass is not lost
+                self._wakeup.clear()
+                due, next_at = self._pop_due(datetime.utcnow())
+                for event in due:
+                    self.stats[event["event"]] += 1
+                    await manager.broadcast(event)
+                timeout = 60.0 if next_at is None else max(0.0, (next_at - datetime.utcnow()).total_seconds())
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=min(timeout, 60.0))
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"SLA engine error: {str(e)}")
+                await asyncio.sleep(1)
+
+    def status(self, limit: int = 10):
+        with self._lock:
+            upcoming = heapq.nsmallest(limit, (
+                (deadline, ticket_id, priority) for ticket_id, (_, priority, _, deadline) in self._tracked.items()
+                if ticket_id not in self._breached
+            ))
+            return {
+                "tracked": len(self._tracked),
+                "pending_timers": len(self._heap),
+                "breached_open": sorted(self._breached),
+                "upcoming": [{"ticket_id": t, "priority": p, "deadline": d.isoformat()} for d, t, p in upcoming],
+                "policy_hours": SLA_HOURS,
+                "source_factors": SLA_SOURCE_FACTORS,
+                "events_fired": dict(self.stats)
+            }
+
+
+sla_engine = SLAEngine()
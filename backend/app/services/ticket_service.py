@@ -1,13 +1,22 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, or_, select
+from sqlalchemy.orm import Session, load_only, undefer_group
 from .. import models, schemas
 from .websocket_manager import manager
+from .archive_service import ArchiveService
+from .incident_service import IncidentService
+from .cache_service import response_cache, ticket_tag, TAG_TICKETS, TAG_STATS
+from .assignment_service import assignment_engine, OPEN_STATUSES
+from .sla_service import sla_engine
+from .anomaly_service import anomaly_detector
+from .write_batcher import write_batcher
 import uuid
 import asyncio
 from datetime import datetime
 
 class TicketService:
     @staticmethod
-    async def create_ticket(db: Session, ticket_data: schemas.TicketCreate, ai_data: dict, raw_output: str = None, validation_errors: str = None):
+    def _build_ticket_values(ticket_data: schemas.TicketCreate, ai_data: dict, raw_output: str = None, validation_errors: str = None):
+        """Column values for a new ticket from the AI triage result (spam overrides and auto-assignment applied)."""
         ticket_id = f"TICK-{uuid.uuid4().hex[:8].upper()}"
         
         is_spam_bool = str(ai_data.get("is_spam", False)).lower() == "true"
@@ -24,7 +33,7 @@ class TicketService:
             ai_data["is_active"] = ai_data.get("is_active", True)
             ai_data["status"] = ai_data.get("final_status") or ai_data.get("status")
 
-        db_ticket = models.Ticket(
+        values = dict(
             ticket_id=ticket_id,
             source=ticket_data.source.value,
             sender=ticket_data.sender,
@@ -55,9 +64,59 @@ class TicketService:
             validation_errors=validation_errors
         )
         
-        db.add(db_ticket)
-        db.commit()
-        db.refresh(db_ticket)
+        # Auto-assign triaged work to the least-loaded admin skilled for the department
+        if not is_spam_bool and values["status"] in OPEN_STATUSES:
+            admin = assignment_engine.pick(values["department"], values["priority"])
+            if admin:
+                values["assigned_to"] = admin
+                values["assigned_at"] = datetime.utcnow()
+                # Reserve the load now so concurrent intakes see it before this commit lands
+                assignment_engine.sync([(ticket_id, admin, values["department"], values["priority"], values["status"])])
+        
+        return values
+
+    @staticmethod
+    def insert_tickets(db: Session, rows: list):
+        """
+        Insert ticket rows in one statement, reading generated columns back via RETURNING
+        instead of a refresh SELECT. Runs inside the caller's transaction; returned
+        tickets are detached so they stay readable after commit.
+        """
+        tickets = db.scalars(
+            insert(models.Ticket).returning(models.Ticket, sort_by_parameter_order=True),
+            rows
+        ).all()
+        for t in tickets:
+            if t.ticket_role == "Follower" and t.parent_incident_id:
+                IncidentService.record_follower(db, t.parent_incident_id, t.created_at)
+            db.expunge(t)
+        return tickets
+
+    @staticmethod
+    async def create_ticket(db: Session, ticket_data: schemas.TicketCreate, ai_data: dict, raw_output: str = None, validation_errors: str = None):
+        values = TicketService._build_ticket_values(ticket_data, ai_data, raw_output, validation_errors)
+        
+        try:
+            if write_batcher.running:
+                # Group commit: shares one transaction with other writes arriving in the same window.
+                # End the request's read transaction first so waiters don't hold the pooled
+                # connections the batcher needs to flush.
+                db.commit()
+                db_ticket = await write_batcher.submit("ticket_insert", values)
+            else:
+                db_ticket = TicketService.insert_tickets(db, [values])[0]
+                db.commit()
+        except Exception:
+            db.rollback()
+            if values.get("assigned_to"):
+                # Release the load reserved at pick time; the ticket never existed
+                assignment_engine.sync([(values["ticket_id"], None, None, None, None)])
+            raise
+        response_cache.invalidate(TAG_TICKETS, TAG_STATS)
+        sla_engine.sync([(
+            db_ticket.ticket_id, db_ticket.status, db_ticket.priority,
+            db_ticket.source, db_ticket.created_at, db_ticket.is_spam
+        )])
         
         # Real-time Broadcast
         event = {
@@ -68,7 +127,8 @@ class TicketService:
                 "is_spam": db_ticket.is_spam == "true",
                 "is_active": db_ticket.is_active == "true",
                 "priority": db_ticket.priority,
-                "summary": db_ticket.summary
+                "summary": db_ticket.summary,
+                "assigned_to": db_ticket.assigned_to
             }
         }
         await manager.broadcast(event)
@@ -76,8 +136,183 @@ class TicketService:
         return db_ticket
 
     @staticmethod
-    def get_tickets(db: Session, skip: int = 0, limit: int = 100):
-        return db.query(models.Ticket).order_by(models.Ticket.created_at.desc()).offset(skip).limit(limit).all()
+    def _operation_values(op: str, value: str, now: datetime):
+        """Column values for one mutation; the single-item PATCH endpoints use the same mapping."""
+        if op == "status":
+            values = {"status": value}
+            if value == models.TicketStatus.RESOLVED.value:
+                values["resolved_at"] = now
+            return values
+        if op == "department":
+            # Manual reassignment clears the AI routing flag
+            return {"department": value, "reassigned_by": "Human", "is_flagged": "false"}
+        if op == "assign":
+            return {"assigned_to": value, "assigned_at": now, "status": models.TicketStatus.PROCESSING.value}
+        raise ValueError(f"Unknown operation '{op}'")
+
+    @staticmethod
+    def stage_operations(db: Session, operations: list):
+        """
+        Execute a list of {"ticket_id", "op", "value"} mutations without committing.
+
+        Operations are bucketed into rounds (a ticket's n-th operation goes into round n,
+        preserving per-ticket order) and each round is grouped by (op, value) so that
+        every group is a single UPDATE ... WHERE ticket_id IN (...). Returns one outcome
+        per input item plus the list of applied changes.
+        """
+        now = datetime.utcnow()
+        results = [None] * len(operations)
+        rounds = []
+        seen = {}
+
+        for index, item in enumerate(operations):
+            ticket_id = item.get("ticket_id")
+            op = item.get("op")
+            value = item.get("value")
+            if not ticket_id or not value:
+                results[index] = {"ticket_id": ticket_id, "op": op, "ok": False, "error": "ticket_id and value are required"}
+                continue
+            try:
+                TicketService._operation_values(op, value, now)
+            except ValueError as e:
+                results[index] = {"ticket_id": ticket_id, "op": op, "ok": False, "error": str(e)}
+                continue
+
+            position = seen.get(ticket_id, 0)
+            seen[ticket_id] = position + 1
+            if position == len(rounds):
+                rounds.append({})
+            rounds[position].setdefault((op, value), []).append(index)
+
+        found = set()
+        for groups in rounds:
+            for (op, value), indexes in groups.items():
+                ticket_ids = [operations[i]["ticket_id"] for i in indexes]
+                updated = db.query(models.Ticket).filter(
+                    models.Ticket.ticket_id.in_(ticket_ids)
+                ).update(
+                    {**TicketService._operation_values(op, value, now), "updated_at": now},
+                    synchronize_session=False
+                )
+                if updated < len(set(ticket_ids)):
+                    found.update(
+                        tid for (tid,) in db.query(models.Ticket.ticket_id).filter(models.Ticket.ticket_id.in_(ticket_ids))
+                    )
+                else:
+                    found.update(ticket_ids)
+
+        changes = []
+        for groups in rounds:
+            for (op, value), indexes in groups.items():
+                for i in indexes:
+                    ticket_id = operations[i]["ticket_id"]
+                    if ticket_id in found:
+                        results[i] = {"ticket_id": ticket_id, "op": op, "ok": True}
+                        changes.append({"ticket_id": ticket_id, "op": op, "value": value})
+                    else:
+                        results[i] = {"ticket_id": ticket_id, "op": op, "ok": False, "error": "Ticket not found"}
+        return results, changes
+
+    @staticmethod
+    async def apply_operations(db: Session, operations: list):
+        """Apply mutations in one transaction (see stage_operations) and broadcast a single coalesced event."""
+        if write_batcher.running:
+            # Group commit: concurrent single-ticket PATCHes share one transaction
+            db.commit()
+            results, changes = await write_batcher.submit("ticket_operations", operations)
+        else:
+            try:
+                results, changes = TicketService.stage_operations(db, operations)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+
+        if changes:
+            # Decide from the columns written, not the op name: assign also moves status to Processing
+            now = datetime.utcnow()
+            status_changed = {
+                c["ticket_id"] for c in changes
+                if "status" in TicketService._operation_values(c["op"], c["value"], now)
+            }
+            assignment_engine.sync_tickets(db, {c["ticket_id"] for c in changes})
+            sla_engine.sync_tickets(db, status_changed)
+            tags = {TAG_TICKETS} | {ticket_tag(c["ticket_id"]) for c in changes}
+            if status_changed:
+                tags.add(TAG_STATS)
+            response_cache.invalidate(*tags)
+            await manager.broadcast({
+                "event": "tickets_batch_updated",
+                "count": len(changes),
+                "changes": changes
+            })
+
+        applied = sum(1 for r in results if r["ok"])
+        return {"applied": applied, "failed": len(results) - applied, "results": results}
+
+    @staticmethod
+    def add_attachments(db: Session, ticket_id: str, attachments: list):
+        if not attachments:
+            return
+        db.add_all([
+            models.TicketAttachment(
+                ticket_id=ticket_id,
+                filename=a["filename"],
+                content_type=a["content_type"],
+                size_bytes=a["size_bytes"],
+                sha256=a["sha256"],
+                storage_path=a["storage_path"],
+                is_inline=str(a["is_inline"]).lower()
+            )
+            for a in attachments
+        ])
+        db.commit()
+
+    @staticmethod
+    def get_attachments(db: Session, ticket_id: str):
+        return db.query(models.TicketAttachment).filter(
+            models.TicketAttachment.ticket_id == ticket_id
+        ).order_by(models.TicketAttachment.id).all()
+
+    @staticmethod
+    def query_tickets(db: Session, columns: list = None):
+        """Ticket query loading only `columns`; None loads full rows including deferred text."""
+        query = db.query(models.Ticket)
+        if columns is None:
+            return query.options(undefer_group(models.LARGE_TEXT))
+        return query.options(load_only(*[getattr(models.Ticket, c) for c in columns]))
+
+    @staticmethod
+    def select_tickets(columns: list = None):
+        """Core SELECT returning plain row mappings instead of ORM instances (list endpoints)."""
+        columns = columns or list(schemas.TicketResponse.model_fields)
+        return select(*[getattr(models.Ticket, c) for c in columns])
+
+    @staticmethod
+    def get_tickets(db: Session, skip: int = 0, limit: int = 100, columns: list = None):
+        stmt = TicketService.select_tickets(columns).order_by(models.Ticket.created_at.desc()).offset(skip).limit(limit)
+        return db.execute(stmt).mappings().all()
+
+    @staticmethod
+    def get_ticket(db: Session, ticket_id: str):
+        ticket = TicketService.query_tickets(db).filter(models.Ticket.ticket_id == ticket_id).first()
+        if ticket is None:
+            ticket = ArchiveService.get_ticket(ticket_id)
+        return ticket
+
+    @staticmethod
+    def search_tickets(db: Session, q: str, limit: int = 100):
+        pattern = f"%{q}%"
+        tickets = TicketService.query_tickets(db).filter(
+            or_(
+                models.Ticket.ticket_id.ilike(pattern),
+                models.Ticket.sender.ilike(pattern),
+                models.Ticket.summary.ilike(pattern)
+            )
+        ).order_by(models.Ticket.created_at.desc()).limit(limit).all()
+        if len(tickets) < limit:
+            tickets += ArchiveService.search(q, limit - len(tickets))
+        return tickets
 
     @staticmethod
     def get_active_incidents(db: Session):
@@ -86,6 +321,39 @@ class TicketService:
             models.Ticket.ticket_role == "Primary"
         ).all()
 
+    @staticmethod
+    async def open_anomaly_incident(db: Session, anomaly: dict):
+        """Open a Primary incident for an intake spike (unless one is still open from the cooldown) and announce it."""
+        if not anomaly["incident_id"]:
+            kind, key = anomaly["kind"], anomaly["key"]
+            label = {
+                "department": f"{key} department", "keyword": f"'{key}'", "source": f"{key} channel", "total": "all channels"
+            }[kind]
+            summary = f"Intake spike: {label} ({anomaly['count']} tickets in {anomaly['window_seconds']}s, expected {anomaly['expected']})"
+            department = anomaly["department"] if anomaly["department"] != "Unassigned" else None
+            ticket = await TicketService.create_ticket(
+                db,
+                schemas.TicketCreate(source=schemas.TicketSource.WEBSITE, sender="anomaly-detector", message=summary),
+                {
+                    "summary": summary,
+                    "category": "Outage",
+                    "priority": "High",
+                    "department": department,
+                    "final_status": "Processing",
+                    "ticket_role": "Primary",
+                    "is_spam": False,
+                    "handoff_summary": "; ".join(
+                        f"{s['kind']} {s['key']}: {s['count']} vs {s['expected']} expected (z={s['z_score']})" for s in anomaly["signals"]
+                    ),
+                    "ai_attempts": "Raised automatically by the intake-rate anomaly detector",
+                    "next_best_action": f"Check for an outage affecting {label} and link incoming reports to this incident"
+                }
+            )
+            anomaly_detector.link_incident(anomaly["department"], ticket.ticket_id)
+            anomaly = {**anomaly, "incident_id": ticket.ticket_id}
+        await manager.broadcast(anomaly)
+        return anomaly
+
     @staticmethod
     def get_ticket_stats(db: Session):
         tickets = db.query(models.Ticket).all()
@@ -107,8 +375,20 @@ class TicketService:
                 by_status["Spam"] = by_status.get("Spam", 0) + 1
             else:
                 by_status[status] = by_status.get(status, 0) + 1
+        
+        # Archived tickets still count towards totals
+        for priority, source, status, is_spam, count in ArchiveService.get_counts():
+            priority = priority or "None"
+            source = source or "Website"
+            status = status or "Received"
+            by_priority[priority] = by_priority.get(priority, 0) + count
+            by_source[source] = by_source.get(source, 0) + count
+            if is_spam == "true":
+                by_status["Spam"] = by_status.get("Spam", 0) + count
+            else:
+                by_status[status] = by_status.get(status, 0) + count
             
-        volume_over_time = []  # Placeholder for future implementation
+        volume_over_time = anomaly_detector.volume_over_time()
         
         return {
             "by_priority": by_priority,
@@ -116,3 +396,9 @@ class TicketService:
             "by_status": by_status,
             "volume_over_time": volume_over_time
         }
+
+write_batcher.register("ticket_insert", TicketService.insert_tickets)
+write_batcher.register(
+    "ticket_operations",
+    lambda db, payloads: [TicketService.stage_operations(db, operations) for operations in payloads]
+)
@@ -0,0 +1,145 @@
+from dotenv import load_dotenv
+from ..database import SessionLocal
+import asyncio
+import bisect
+import logging
+import os
+import threading
+import time
+
+load_dotenv()
+
+
+class Histogram:
+    """Fixed-bucket histogram (cumulative counts are not kept, each bucket counts its own range)."""
+
+    def __init__(self, bounds: list):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.total += value
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f"<={b}" for b in self.bounds] + [f">{self.bounds[-1]}"]
+            return {
+                "buckets": dict(zip(labels, self.counts)),
+                "count": self.count,
+                "mean": round(self.total / self.count, 3) if self.count else 0
+            }
+
+
+class WriteBatcher:
+    """
+    Group commit for ticket writes.
+
+    Callers submit (kind, payload) and await their own result. The background task
+    collects whatever arrives within WRITE_BATCH_WINDOW_MS (or WRITE_BATCH_MAX_ITEMS
+    items), hands all payloads of a kind to its registered handler in one session,
+    and commits once, so a burst of intakes costs one fsync instead of one each.
+    If the group commit fails, items are retried one per transaction so a single
+    bad write cannot fail its neighbours.
+    """
+
+    def __init__(self, max_items: int = 64, window_ms: float = 5):
+        self.max_items = max_items
+        self.window = window_ms / 1000
+        self.running = False
+        self._handlers = {}
+        self._queue = None
+        self.commit_ms = Histogram([1, 2, 5, 10, 25, 50, 100, 250, 500, 1000])
+        self.wait_ms = Histogram([1, 2, 5, 10, 25, 50, 100, 250, 500, 1000])
+        self.batch_size = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+
+    def register(self, kind: str, handler):
+        """handler(db, payloads) -> one result per payload; it must not commit."""
+        self._handlers[kind] = handler
+
+    async def submit(self, kind: str, payload):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((kind, payload, future, time.perf_counter()))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self.running = True
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                deadline = loop.time() + self.window
+                while len(batch) < self.max_items:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                outcomes = await asyncio.to_thread(self._flush, batch)
+                now = time.perf_counter()
+                for (kind, payload, future, enqueued_at), (ok, value) in zip(batch, outcomes):
+                    self.wait_ms.observe((now - enqueued_at) * 1000)
+                    if future.done():
+                        continue
+                    if ok:
+                        future.set_result(value)
+                    else:
+                        future.set_exception(value)
+        finally:
+            self.running = False
+
+    def _run_group(self, db, items):
+        """Run handlers for items grouped by kind (first-appearance order); results in item order."""
+        results = [None] * len(items)
+        groups = {}
+        for index, (kind, payload, _, _) in enumerate(items):
+            groups.setdefault(kind, []).append(index)
+        for kind, indexes in groups.items():
+            values = self._handlers[kind](db, [items[i][1] for i in indexes])
+            for i, value in zip(indexes, values):
+                results[i] = value
+        return results
+
+    def _flush(self, batch):
+        self.batch_size.observe(len(batch))
+        db = SessionLocal(expire_on_commit=False)
+        try:
+            started = time.perf_counter()
+            results = self._run_group(db, batch)
+            db.commit()
+            self.commit_ms.observe((time.perf_counter() - started) * 1000)
+            return [(True, r) for r in results]
+        except Exception as e:
+            db.rollback()
+            if len(batch) == 1:
+                return [(False, e)]
+            logging.error(f"Group commit of {len(batch)} writes failed, retrying individually: {str(e)}")
+        finally:
+            db.close()
+        return [self._flush([item])[0] for item in batch]
+
+    def get_stats(self):
+        return {
+            "running": self.running,
+            "max_items": self.max_items,
+            "window_ms": self.window * 1000,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batch_size": self.batch_size.snapshot(),
+            "commit_ms": self.commit_ms.snapshot(),
+            "wait_ms": self.wait_ms.snapshot()
+        }
+
+
+write_batcher = WriteBatcher(
+    max_items=int(os.getenv("WRITE_BATCH_MAX_ITEMS", "64")),
+    window_ms=float(os.getenv("WRITE_BATCH_WINDOW_MS", "5"))
+)
@@ -126,7 +126,7 @@ function App() {
   const fetchData = async () => {
     try {
       const [ticketsData, statsData] = await Promise.all([
-        ticketService.getTickets(),
+        ticketService.getTickets(0, 100, 'compact'),
         ticketService.getStats()
       ]);
       setTickets(ticketsData);
@@ -23,6 +23,8 @@ const Analytics: React.FC<AnalyticsProps> = ({ stats }) => {
   const priorityData = Object.entries(stats.by_priority).map(([name, value]) => ({ name, value }));
   const sourceData = Object.entries(stats.by_source).map(([name, value]) => ({ name, value }));
   const statusData = Object.entries(stats.by_status).map(([name, value]) => ({ name, value }));
+  // Live intake per time bucket with the anomaly detector's baseline
+  const volumeData = stats.volume_over_time || [];
 
   const COLORS = ['#3b82f6', '#10b981', '#f59e0b', '#ef4444', '#8b5cf6'];
 
@@ -116,15 +118,7 @@ const Analytics: React.FC<AnalyticsProps> = ({ stats }) => {
           <h3 className="font-bold text-gray-900 text-lg mb-6">Ticket Volume Trend</h3>
           <div className="h-80 w-full">
             <ResponsiveContainer width="100%" height="100%">
-              <LineChart data={[
-                { name: 'Mon', volume: 12 },
-                { name: 'Tue', volume: 19 },
-                { name: 'Wed', volume: 15 },
-                { name: 'Thu', volume: 22 },
-                { name: 'Fri', volume: 30 },
-                { name: 'Sat', volume: 10 },
-                { name: 'Sun', volume: 8 },
-              ]}>
+              <LineChart data={volumeData}>
                 <CartesianGrid strokeDasharray="3 3" vertical={false} stroke="#f3f4f6" />
                 <XAxis 
                   dataKey="name" 
@@ -148,6 +142,15 @@ const Analytics: React.FC<AnalyticsProps> = ({ stats }) => {
                   dot={{ fill: '#3b82f6', strokeWidth: 2, r: 4 }} 
                   activeDot={{ r: 6 }}
                 />
+                <Line 
+                  type="monotone" 
+                  dataKey="expected" 
+                  name="baseline"
+                  stroke="#9ca3af" 
+                  strokeWidth={2} 
+                  strokeDasharray="5 5"
+                  dot={false}
+                />
               </LineChart>
             </ResponsiveContainer>
           </div>
@@ -1,12 +1,34 @@
-import React from 'react';
+import React, { useEffect, useState } from 'react';
 import { ShieldCheck, AlertTriangle, Code, Terminal, Brain } from 'lucide-react';
 import { format } from 'date-fns';
+import { ticketService } from '../services/api';
 
 interface GuardrailPanelProps {
   tickets: any[];
 }
 
+// The ticket list is fetched compact, so AI traces are loaded per ticket for the newest few
+const TRACE_LIMIT = 20;
+
 const GuardrailPanel: React.FC<GuardrailPanelProps> = ({ tickets }) => {
+  const [traces, setTraces] = useState<Record<string, any>>({});
+  const recentIds = tickets.slice(0, TRACE_LIMIT).map((t) => t.ticket_id);
+
+  useEffect(() => {
+    const missing = recentIds.filter((id) => !(id in traces));
+    if (missing.length === 0) return;
+    Promise.all(missing.map((id) => ticketService.getTicket(id).catch(() => null)))
+      .then((loaded) => {
+        setTraces((prev) => {
+          const next = { ...prev };
+          missing.forEach((id, i) => { next[id] = loaded[i]; });
+          return next;
+        });
+      });
+  }, [recentIds.join(',')]);
+
+  const traced = recentIds.map((id) => traces[id]).filter((t) => t && t.ai_raw_output);
+
   return (
     <div className="space-y-6">
       <div className="bg-white p-6 rounded-2xl border border-gray-100 shadow-sm">
@@ -37,7 +59,7 @@ const GuardrailPanel: React.FC<GuardrailPanelProps> = ({ tickets }) => {
       </div>
 
       <div className="space-y-4">
-        {tickets.filter(t => t.ai_raw_output).map((ticket) => (
+        {traced.map((ticket) => (
           <div key={ticket.ticket_id} className="bg-white rounded-2xl border border-gray-100 shadow-sm overflow-hidden">
             <div className="p-4 bg-gray-50 border-b border-gray-100 flex items-center justify-between">
               <div className="flex items-center gap-3">
@@ -97,7 +119,7 @@ const GuardrailPanel: React.FC<GuardrailPanelProps> = ({ tickets }) => {
           </div>
         ))}
 
-        {tickets.filter(t => t.ai_raw_output).length === 0 && (
+        {traced.length === 0 && (
           <div className="p-12 text-center bg-gray-50 rounded-2xl border-2 border-dashed border-gray-200">
             <Terminal size={48} className="mx-auto text-gray-300 mb-4" />
             <p className="text-gray-500 font-medium">No system logs recorded yet.</p>
@@ -7,8 +7,12 @@ const api = axios.create({
 });
 
 export const ticketService = {
-  getTickets: async (skip = 0, limit = 100) => {
-    const response = await api.get('/tickets/', { params: { skip, limit } });
+  getTickets: async (skip = 0, limit = 100, fields?: string) => {
+    const response = await api.get('/tickets/', { params: { skip, limit, fields } });
+    return response.data;
+  },
+  getTicket: async (ticketId: string) => {
+    const response = await api.get(`/tickets/${ticketId}`);
     return response.data;
   },
   getStats: async () => {
@@ -0,0 +1,83 @@
+"""
+Microbenchmark: ticket list serialization.
+
+Compares the old path (ORM instances -> TicketResponse per row -> jsonable_encoder
+-> stdlib json) with the fast path used by the list endpoints (column mappings ->
+precompiled TypeAdapter -> JSON bytes), against an in-memory SQLite DB.
+
+Usage (from the repo root): python scripts/bench_serialization.py --rows 100 --repeat 200
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, undefer_group
+
+from app import models, schemas
+from app.database import Base
+from app.responses import dump_ticket_rows
+from app.services.ticket_service import TicketService
+
+
+def seed(db, rows):
+    now = datetime.datetime.utcnow()
+    for i in range(rows):
+        db.add(models.Ticket(
+            ticket_id=f"TICK-{i:08X}", source="WhatsApp", sender=f"+1555{i:07d}",
+            original_message="My laptop cannot reach the VPN since this morning. " * 20,
+            summary="VPN connectivity failure", category="Network", priority="High",
+            department="Network", sentiment="Frustrated", status="Processing",
+            handoff_summary="User cannot connect to VPN gateway. " * 5,
+            ai_attempts="Classified as Network issue, checked for duplicates",
+            next_best_action="Verify VPN client config",
+            ai_raw_output=json.dumps({"summary": "VPN connectivity failure", "priority": "High"}) * 10,
+            created_at=now - datetime.timedelta(minutes=i)
+        ))
+    db.commit()
+
+
+def old_path(db, limit):
+    tickets = db.query(models.Ticket).options(undefer_group(models.LARGE_TEXT)).order_by(
+        models.Ticket.created_at.desc()
+    ).limit(limit).all()
+    rows = [schemas.TicketResponse.model_validate(t) for t in tickets]
+    return json.dumps(jsonable_encoder(rows)).encode("utf-8")
+
+
+def fast_path(db, limit, columns=None, compact=False):
+    return dump_ticket_rows(TicketService.get_tickets(db, 0, limit, columns), columns, compact=compact)
+
+
+def bench(label, fn, repeat):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<32} {elapsed * 1000:8.2f} ms/request  {len(body) / 1024:8.1f} KiB")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ticket list serialization")
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    seed(db, args.rows)
+
+    compact = list(schemas.TicketListItem.model_fields)
+    baseline = bench("ORM + jsonable_encoder (old)", lambda: old_path(db, args.rows), args.repeat)
+    fast = bench("mappings + TypeAdapter", lambda: fast_path(db, args.rows), args.repeat)
+    slim = bench("mappings + TypeAdapter, compact", lambda: fast_path(db, args.rows, compact, True), args.repeat)
+    print(f"\nspeedup full: {baseline / fast:.1f}x   compact: {baseline / slim:.1f}x")
@@ -0,0 +1,36 @@
+"""
+Offline replay: re-triage historical tickets through the shadow candidates.
+
+Each ticket's original message goes through every candidate configured in
+SHADOW_CANDIDATES (at most --concurrency tickets at a time). Results are stored in
+shadow_results under a new run id and the comparison against the decisions stored
+on the tickets is printed.
+
+Usage (from backend/, so the relative DB path resolves):
+    SHADOW_CANDIDATES="lite=gemini-2.0-flash-lite:compact" python ../scripts/shadow_replay.py --limit 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from app import models  # noqa: F401  (registers the tables)
+from app.database import Base, engine
+from app.services.shadow_service import shadow_service
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay historical tickets through shadow triage candidates")
+    parser.add_argument("--candidates", help="Comma-separated candidate names (default: all configured)")
+    parser.add_argument("--limit", type=int, default=100, help="Newest N tickets")
+    parser.add_argument("--days", type=int, default=None, help="Only tickets from the last N days")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    names = [c.strip() for c in args.candidates.split(",")] if args.candidates else None
+    report = asyncio.run(shadow_service.replay(names, args.limit, args.days, args.concurrency))
+    print(json.dumps(report, indent=2))